@@ -1,40 +1,3049 @@
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
 import os
 import sys
 import subprocess
-import tempfile
+import argparse
+import glob
+import json
+import re
+import hashlib
+import csv
+import dataclasses
+import wave
+import platform
+import shutil
 import queue
 import time
+import gc
+import math
+import bisect
+import contextlib
+import warnings
+import cProfile
+import pstats
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+try:
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox, scrolledtext
+except ImportError:
+    # Sin Tk solo está disponible el modo de línea de comandos
+    tk = None
 
 # Variables globales para carga diferida
 whisper_module = None
 torch_module = None
 
-def load_whisper():
-    """Carga el módulo whisper de forma diferida"""
-    global whisper_module
-    if whisper_module is None:
-        try:
-            import whisper
-            whisper_module = whisper
-        except ImportError as e:
-            print(f"Error cargando Whisper: {e}")
-            return None
-    return whisper_module
+def load_whisper():
+    """Carga el módulo whisper de forma diferida"""
+    global whisper_module
+    if whisper_module is None:
+        try:
+            import whisper
+            whisper_module = whisper
+        except ImportError as e:
+            print(f"Error cargando Whisper: {e}")
+            return None
+    return whisper_module
+
+def load_torch():
+    """Carga el módulo torch de forma diferida"""
+    global torch_module
+    if torch_module is None:
+        try:
+            import torch
+            torch_module = torch
+        except ImportError as e:
+            print(f"Error cargando PyTorch: {e}")
+            return None
+    return torch_module
+
+class TraceRecorder:
+    """Registra intervalos en formato Chrome Trace Event (chrome://tracing, Perfetto).
+
+    Cada intervalo es un evento completo ("X") con el hilo que lo ejecutó,
+    así se ve qué etapas se solapan entre hilos y trabajos simultáneos.
+    Los tiempos son de `time.monotonic()` relativos a la creación.
+    """
+
+    def __init__(self):
+        self.origin = time.monotonic()
+        self.events = []
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def _timestamp(self, seconds):
+        """Convierte un instante monotónico a microsegundos desde el origen"""
+        return round((seconds - self.origin) * 1e6, 1)
+
+    def complete(self, name, started, seconds, category="stage", **args):
+        """Añade un intervalo ya medido"""
+        thread = threading.current_thread()
+        event = {
+            "name": name, "cat": category, "ph": "X",
+            "ts": self._timestamp(started), "dur": round(seconds * 1e6, 1),
+            "pid": os.getpid(), "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.threads[thread.ident] = thread.name
+            self.events.append(event)
+
+    def instant(self, name, category="event", **args):
+        """Añade un evento puntual en el hilo actual"""
+        thread = threading.current_thread()
+        event = {
+            "name": name, "cat": category, "ph": "i", "s": "t",
+            "ts": self._timestamp(time.monotonic()),
+            "pid": os.getpid(), "tid": thread.ident, "args": args,
+        }
+        with self._lock:
+            self.threads[thread.ident] = thread.name
+            self.events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, category="stage", **args):
+        """Contexto que registra un intervalo"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.complete(name, started, time.monotonic() - started, category, **args)
+
+    def save(self, path):
+        """Escribe el archivo trace.json"""
+        with self._lock:
+            metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": ident,
+                         "args": {"name": name}} for ident, name in self.threads.items()]
+            events = metadata + sorted(self.events, key=lambda event: event["ts"])
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+class StageTimer:
+    """Mide el tiempo de cada etapa del proceso con un reloj monotónico.
+
+    Acumula el total y el número de mediciones por etapa y llama a
+    `on_stage(etapa, segundos, total)` al terminar cada medición. Con un
+    `tracer` (TraceRecorder) cada medición queda además en la línea de tiempo.
+    """
+
+    def __init__(self, on_stage=None, tracer=None):
+        self.on_stage = on_stage
+        self.tracer = tracer
+        self.totals = OrderedDict()
+        self.counts = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Contexto que mide una etapa"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - started)
+
+    def add(self, name, seconds):
+        """Suma una medición a una etapa que acaba de terminar"""
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if self.tracer:
+            self.tracer.complete(name, time.monotonic() - seconds, seconds)
+        if self.on_stage:
+            self.on_stage(name, seconds, self.totals[name])
+
+    def span(self, name, category="span", **args):
+        """Intervalo que solo se registra en la línea de tiempo (sin sumar a los totales)"""
+        if self.tracer:
+            return self.tracer.span(name, category, **args)
+        return contextlib.nullcontext()
+
+    def as_dict(self):
+        """Totales por etapa en segundos"""
+        return {name: round(total, 4) for name, total in self.totals.items()}
+
+def get_compute_device():
+    """Devuelve el dispositivo de inferencia disponible ('cuda' o 'cpu')"""
+    torch = load_torch()
+    if torch is not None and torch.cuda.is_available():
+        return "cuda"
+    return "cpu"
+
+def default_precision(device):
+    """Precisión de cálculo por defecto para un dispositivo"""
+    return "fp16" if device == "cuda" else "fp32"
+
+# Precisiones admitidas; int8 cuantiza dinámicamente las capas lineales (solo CPU)
+PRECISIONS = ("auto", "fp32", "fp16", "int8")
+
+def resolve_precision(precision, device):
+    """Precisión efectiva en un dispositivo: fp16 necesita CUDA e int8 es solo para CPU"""
+    if (precision == "auto" or (precision == "fp16" and device == "cpu")
+            or (precision == "int8" and device != "cpu")):
+        return default_precision(device)
+    return precision
+
+# Hilos de CPU (0 = automático según los núcleos disponibles) y núcleos permitidos ("0-3,6")
+DEFAULT_TORCH_THREADS = int(os.environ.get("VOICE_EXTRACTOR_TORCH_THREADS", "0"))
+DEFAULT_INTEROP_THREADS = int(os.environ.get("VOICE_EXTRACTOR_INTEROP_THREADS", "0"))
+DEFAULT_FFMPEG_THREADS = int(os.environ.get("VOICE_EXTRACTOR_FFMPEG_THREADS", "0"))
+DEFAULT_CPU_AFFINITY = os.environ.get("VOICE_EXTRACTOR_CPU_AFFINITY", "")
+
+def cgroup_cpu_quota():
+    """Límite de CPU del cgroup en núcleos (cgroup v2 o v1), o None si no hay límite"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()[:2]
+        return None if limit == "max" else int(limit) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            limit = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return limit / period if limit > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+def available_cpu_count():
+    """Núcleos que el proceso puede usar: afinidad y cuota del cgroup, no los del equipo"""
+    count = os.cpu_count() or 1
+    if hasattr(os, "sched_getaffinity"):
+        count = len(os.sched_getaffinity(0)) or count
+    quota = cgroup_cpu_quota()
+    if quota:
+        count = min(count, math.ceil(quota))
+    return max(1, count)
+
+def parse_cpu_list(text):
+    """Convierte una lista de núcleos como "0-3,6" en [0, 1, 2, 3, 6]"""
+    cpus = []
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                first, last = part.split("-", 1)
+                cpus.extend(range(int(first), int(last) + 1))
+            else:
+                cpus.append(int(part))
+        except ValueError:
+            raise Exception(f"Lista de núcleos no válida: '{text}' (ejemplo: 0-3,6)")
+    return sorted(set(cpus))
+
+def resolve_cpu_settings(options):
+    """Hilos de torch, de inter-op y de FFmpeg efectivos y núcleos elegidos.
+
+    Los valores 0 se calculan a partir de los núcleos disponibles (o de los
+    de `cpu_affinity` si se indicaron): torch usa todos, inter-op uno, ya que
+    Whisper apenas lo aprovecha, y FFmpeg como mucho dos, para no competir
+    con la inferencia cuando ambos trabajan a la vez.
+    """
+    cpus = parse_cpu_list(options["cpu_affinity"]) if options["cpu_affinity"] else None
+    cores = len(cpus) if cpus else available_cpu_count()
+    return {
+        "cpus": cpus,
+        "torch_threads": options["torch_threads"] or cores,
+        "interop_threads": options["interop_threads"] or 1,
+        "ffmpeg_threads": options["ffmpeg_threads"] or min(2, cores),
+    }
+
+def set_cpu_affinity(cpus):
+    """Fija los núcleos del proceso actual y de los hilos y procesos que cree después"""
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return False
+    try:
+        os.sched_setaffinity(0, cpus)
+    except OSError as e:
+        raise Exception(f"No se pudo fijar la afinidad de CPU {cpus}: {e}")
+    return True
+
+def apply_torch_threads(torch_threads, interop_threads):
+    """Ajusta los hilos de torch del proceso.
+
+    El número de hilos inter-op solo se puede cambiar antes de que torch
+    empiece a usarlos, así que después se conserva el primero aplicado.
+    """
+    torch = load_torch()
+    if torch is None:
+        return
+    if torch.get_num_threads() != torch_threads:
+        torch.set_num_threads(torch_threads)
+    if torch.get_num_interop_threads() != interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            pass
+
+# Frecuencia de muestreo y salto del espectrograma que espera Whisper
+SAMPLE_RATE = 16000
+HOP_LENGTH = 160
+
+def probe_duration(path):
+    """Obtiene la duración en segundos de un archivo con ffprobe (None si falla)"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return float(result.stdout.strip())
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return None
+
+# Bytes finales de los errores de FFmpeg que se conservan para el mensaje de error
+FFMPEG_STDERR_TAIL_BYTES = 64 * 1024
+
+def drain_stream(stream, limit=FFMPEG_STDERR_TAIL_BYTES):
+    """Lee un flujo hasta el final en un hilo y conserva solo sus últimos `limit` bytes.
+
+    Devuelve (hilo, función que devuelve el final leído). Evita que un
+    proceso se bloquee con la tubería llena mientras se lee otra.
+    """
+    tail = bytearray()
+
+    def reader():
+        for chunk in iter(lambda: stream.read1(65536), b''):
+            tail.extend(chunk)
+            if len(tail) > limit:
+                del tail[:len(tail) - limit]
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    return thread, lambda: bytes(tail)
+
+def decode_audio(path, sample_rate=SAMPLE_RATE, timer=None, threads=0):
+    """Decodifica un archivo a PCM mono float32 leyendo la salida de FFmpeg en memoria.
+
+    FFmpeg escribe s16le por una tubería directamente sobre un búfer de NumPy
+    (reservado según la duración estimada), sin archivos temporales ni una
+    segunda decodificación dentro de Whisper. `threads` limita los hilos de
+    FFmpeg (0 = los que elija FFmpeg).
+    """
+    cmd = [
+        'ffmpeg', '-nostdin', '-threads', str(threads),
+        '-i', path,
+        '-vn', '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ac', '1', '-ar', str(sample_rate),
+        '-loglevel', 'error', '-'
+    ]
+
+    timer = timer or StageTimer()
+    with timer.stage("ffprobe"):
+        duration = probe_duration(path)
+    started = time.monotonic()
+    capacity = int((duration or 60) * sample_rate) + sample_rate
+    buffer = np.empty(capacity, dtype=np.int16)
+    filled = 0  # bytes escritos en el búfer
+
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise Exception("FFmpeg no encontrado. Por favor instálalo.")
+
+    # Los errores se leen en paralelo: con la tubería llena FFmpeg dejaría de escribir audio
+    stderr_thread, stderr_tail = drain_stream(process.stderr)
+    try:
+        while True:
+            view = memoryview(buffer).cast('B')
+            if filled == len(view):
+                # La duración estimada se quedó corta: ampliar el búfer
+                view.release()
+                buffer = np.resize(buffer, len(buffer) * 2)
+                continue
+            read = process.stdout.readinto(view[filled:])
+            view.release()
+            if not read:
+                break
+            filled += read
+
+        returncode = process.wait()
+        stderr_thread.join()
+        if returncode != 0:
+            stderr = stderr_tail().decode('utf-8', errors='replace')
+            raise Exception(f"Error al convertir audio: {stderr}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        stderr_thread.join()
+        process.stdout.close()
+        process.stderr.close()
+
+    audio = buffer[:filled // 2].astype(np.float32)
+    audio *= 1.0 / 32768.0
+    timer.add("decode_audio", time.monotonic() - started)
+    return audio
+
+def lower_thread_priority():
+    """Baja la prioridad del hilo actual para no competir con la interfaz ni con los trabajos.
+
+    Solo en Windows, donde la prioridad es por hilo: en Linux el valor nice lo
+    heredarían los hilos de cálculo que torch crease desde este hilo.
+    """
+    if sys.platform != "win32":
+        return
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetThreadPriority(kernel32.GetCurrentThread(), -1)  # THREAD_PRIORITY_BELOW_NORMAL
+    except (ImportError, AttributeError, OSError):
+        pass
+
+def quantized_model_path(name):
+    """Archivo del modelo cuantizado en int8 (depende del checkpoint de origen y de la versión de torch)"""
+    torch = load_torch()
+    version = getattr(torch, "__version__", "unknown").replace("+", "_")
+    source = hashlib.sha1(model_source_url(name).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(get_cache_dir("models"), f"{name}_int8_{source}_torch{version}.pt")
+
+def quantize_model(model):
+    """Cuantización dinámica int8 de las capas lineales (pesos int8, activaciones fp32)"""
+    torch = load_torch()
+    for module in model.modules():
+        # Las capas de Whisper son subclases de nn.Linear que solo ajustan el dtype
+        # de los pesos; quantize_dynamic únicamente reconoce el tipo exacto
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def save_quantized_model(name, model, path):
+    """Guarda los pesos del modelo cuantizado junto con sus dimensiones y su checkpoint de origen.
+
+    Solo se guardan tensores (state_dict), no el objeto del modelo, para que
+    la carga no tenga que ejecutar código arbitrario de la caché.
+    """
+    torch = load_torch()
+    saved = {"source": model_source_url(name), "dims": dataclasses.asdict(model.dims),
+             "state_dict": model.state_dict()}
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    torch.save(saved, temp_path)
+    os.replace(temp_path, path)
+
+def load_quantized_model(name, path):
+    """Reconstruye el modelo cuantizado guardado (None si viene de otro checkpoint).
+
+    Se crea un modelo vacío con las dimensiones guardadas, se cuantiza igual
+    que al generarlo y se le cargan los pesos leídos con `weights_only`.
+    """
+    torch = load_torch()
+    whisper = load_whisper()
+    saved = torch.load(path, map_location="cpu", weights_only=True)
+    if saved.get("source") != model_source_url(name):
+        return None
+    model = quantize_model(whisper.model.Whisper(whisper.model.ModelDimensions(**saved["dims"])))
+    model.load_state_dict(saved["state_dict"])
+    set_official_alignment_heads(model, name)
+    return model
+
+# Forzar la verificación SHA-256 completa de los checkpoints en cada carga
+DEFAULT_VERIFY_CHECKPOINTS = os.environ.get("VOICE_EXTRACTOR_VERIFY_MODELS", "0") == "1"
+
+def whisper_checkpoint_path(name):
+    """Ruta y SHA-256 esperado del checkpoint descargado por Whisper (None si no es un modelo oficial)"""
+    whisper = load_whisper()
+    url = getattr(whisper, "_MODELS", {}).get(name)
+    if url is None:
+        return None, None
+    # Misma carpeta de descarga que usa whisper.load_model por defecto
+    root = os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(root, "whisper", os.path.basename(url)), url.split("/")[-2]
+
+def verified_checkpoints_path():
+    """Archivo con las marcas de los checkpoints ya verificados"""
+    return os.path.join(get_cache_dir("models"), "verified_checkpoints.json")
+
+def read_verified_checkpoints():
+    """Marcas de verificación por ruta: tamaño, fecha de modificación y SHA-256"""
+    try:
+        with open(verified_checkpoints_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def checkpoint_marker(path, sha256):
+    """Marca que identifica una versión concreta del archivo en disco"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+
+def is_checkpoint_verified(path, sha256):
+    """Indica si el archivo no ha cambiado desde que se verificó su SHA-256"""
+    try:
+        return read_verified_checkpoints().get(path) == checkpoint_marker(path, sha256)
+    except OSError:
+        return False
+
+def mark_checkpoint_verified(path, sha256):
+    """Registra que el archivo actual tiene el SHA-256 esperado"""
+    try:
+        markers = read_verified_checkpoints()
+        markers[path] = checkpoint_marker(path, sha256)
+        target = verified_checkpoints_path()
+        temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(markers, f, indent=2)
+        os.replace(temp_path, target)
+    except OSError as e:
+        print(f"No se pudo guardar la marca de verificación de {path}: {e}", file=sys.stderr)
+
+def set_official_alignment_heads(model, name):
+    """Aplica las cabezas de alineamiento de un modelo oficial (las de marcas de tiempo por palabra)"""
+    whisper = load_whisper()
+    alignment_heads = getattr(whisper, "_ALIGNMENT_HEADS", {}).get(name)
+    if alignment_heads is not None:
+        model.set_alignment_heads(alignment_heads)
+
+def load_whisper_checkpoint(name, device, verify=DEFAULT_VERIFY_CHECKPOINTS):
+    """Carga un modelo oficial sin volver a calcular el SHA-256 si ya se verificó.
+
+    `whisper.load_model(nombre)` lee y calcula el hash del checkpoint completo
+    en cada carga. Tras la primera verificación correcta se guarda una marca
+    con la ruta, el tamaño y la fecha de modificación; mientras coincida, el
+    modelo se carga directamente desde la ruta. Si el archivo cambia, o con
+    `verify`, se vuelve a verificar por completo (y a descargar si hace falta).
+    """
+    whisper = load_whisper()
+    path, sha256 = whisper_checkpoint_path(name)
+    if path is None:
+        return whisper.load_model(name, device=device)
+
+    if not verify and is_checkpoint_verified(path, sha256):
+        model = whisper.load_model(path, device=device)
+        # Al cargar desde una ruta Whisper no conoce las cabezas de alineamiento del modelo
+        set_official_alignment_heads(model, name)
+        return model
+
+    model = whisper.load_model(name, device=device)
+    mark_checkpoint_verified(path, sha256)
+    return model
+
+def load_model(name, device, precision, verify=DEFAULT_VERIFY_CHECKPOINTS):
+    """Carga un modelo de Whisper; en int8 reutiliza el modelo cuantizado guardado en disco.
+
+    La cuantización se hace una sola vez por checkpoint y versión de torch:
+    los pesos cuantizados se guardan en la caché y las cargas siguientes
+    reconstruyen el modelo con ellos.
+    Si existe una versión convertida del modelo (ver `convert_model`) se
+    mapea en memoria en lugar de leer el checkpoint original. Con `verify`
+    se fuerza la verificación SHA-256 completa del checkpoint original.
+    """
+    whisper = load_whisper()
+    if whisper is None:
+        raise Exception("No se pudo cargar el módulo Whisper")
+    if precision != "int8":
+        model = load_converted_model(name, device)
+        return model if model is not None else load_whisper_checkpoint(name, device, verify)
+
+    path = quantized_model_path(name)
+    if os.path.exists(path):
+        try:
+            model = load_quantized_model(name, path)
+            if model is not None:
+                return model
+        except Exception as e:
+            print(f"No se pudo leer el modelo cuantizado {path}, se vuelve a generar: {e}", file=sys.stderr)
+
+    model = load_converted_model(name, "cpu")
+    if model is None:
+        model = load_whisper_checkpoint(name, "cpu", verify)
+    model = quantize_model(model)
+    save_quantized_model(name, model, path)
+    return model
+
+# Formato convertido de los modelos: cabecera JSON y tensores planos alineados,
+# al estilo de safetensors, para mapearlos en memoria sin copiarlos
+CONVERTED_FORMAT = "voice-extractor-tensors"
+CONVERTED_VERSION = 1
+CONVERTED_ALIGNMENT = 64
+
+def converted_model_path(name):
+    """Archivo del modelo convertido a tensores planos"""
+    return os.path.join(get_cache_dir("models"), f"{name}.tensors")
+
+def model_source_url(name):
+    """URL del checkpoint oficial de un modelo (identifica la versión convertida)"""
+    whisper = load_whisper()
+    return getattr(whisper, "_MODELS", {}).get(name, name)
+
+def model_tensors(model):
+    """Parámetros y búferes de un modelo, incluidos los no persistentes"""
+    tensors = dict(model.named_parameters())
+    tensors.update(model.named_buffers())
+    return tensors
+
+def convert_model(name, verify=True):
+    """Convierte un modelo de Whisper al formato plano mapeable en memoria.
+
+    Se guardan todos los parámetros y búferes en float32 (la LayerNorm de
+    Whisper necesita los pesos en fp32, así que otra precisión obligaría a
+    copiarlos al cargar). Con `verify` el archivo escrito se vuelve a cargar
+    y se compara tensor a tensor con el modelo original.
+    Devuelve un diccionario con la ruta, el tamaño y los tensores escritos.
+    """
+    whisper = load_whisper()
+    if whisper is None:
+        raise Exception("No se pudo cargar el módulo Whisper")
+    model = load_whisper_checkpoint(name, "cpu")
+
+    header = {"format": CONVERTED_FORMAT, "version": CONVERTED_VERSION,
+              "source": model_source_url(name), "dims": dataclasses.asdict(model.dims), "tensors": {}}
+    arrays = []
+    offset = 0
+    for tensor_name, tensor in model_tensors(model).items():
+        sparse = tensor.is_sparse
+        array = (tensor.to_dense() if sparse else tensor).detach().contiguous().numpy()
+        offset = -(-offset // CONVERTED_ALIGNMENT) * CONVERTED_ALIGNMENT
+        header["tensors"][tensor_name] = {"dtype": array.dtype.str, "shape": list(array.shape),
+                                          "offset": offset, "sparse": sparse}
+        arrays.append((offset, array))
+        offset += array.nbytes
+
+    encoded = json.dumps(header).encode('utf-8')
+    data_start = -(-(8 + len(encoded)) // CONVERTED_ALIGNMENT) * CONVERTED_ALIGNMENT
+    path = converted_model_path(name)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(len(encoded).to_bytes(8, "little"))
+        f.write(encoded)
+        for tensor_offset, array in arrays:
+            f.seek(data_start + tensor_offset)
+            f.write(array.tobytes())
+    os.replace(temp_path, path)
+
+    mismatched = verify_converted_model(name, model) if verify else None
+    if mismatched:
+        os.remove(path)
+        raise Exception(f"La conversión de '{name}' no coincide con el original: {', '.join(mismatched[:5])}")
+    return {"model": name, "output": path, "size_mb": round(os.path.getsize(path) / (1024 * 1024), 1),
+            "tensors": len(arrays), "verified": verify}
+
+def verify_converted_model(name, reference):
+    """Nombres de los tensores del modelo convertido que no coinciden con `reference`"""
+    torch = load_torch()
+    converted = load_converted_model(name, "cpu")
+    if converted is None:
+        return ["<archivo convertido no disponible>"]
+    expected = model_tensors(reference)
+    actual = model_tensors(converted)
+    mismatched = list(expected.keys() ^ actual.keys())
+    for tensor_name, tensor in expected.items():
+        if tensor_name in actual:
+            other = actual[tensor_name]
+            if tensor.is_sparse:
+                tensor, other = tensor.to_dense(), other.to_dense()
+            if tensor.dtype != other.dtype or not torch.equal(tensor, other):
+                mismatched.append(tensor_name)
+    return sorted(mismatched)
+
+def read_converted_header(path):
+    """Cabecera y posición de inicio de los datos de un modelo convertido"""
+    with open(path, 'rb') as f:
+        length = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(length).decode('utf-8'))
+    if header.get("format") != CONVERTED_FORMAT or header.get("version") != CONVERTED_VERSION:
+        raise ValueError("formato desconocido")
+    data_start = -(-(8 + length) // CONVERTED_ALIGNMENT) * CONVERTED_ALIGNMENT
+    return header, data_start
+
+def load_converted_model(name, device):
+    """Carga un modelo convertido mapeando sus tensores en memoria (None si no hay uno válido).
+
+    El modelo se construye en el dispositivo "meta", sin reservar ni
+    inicializar pesos, y cada parámetro apunta directamente al archivo
+    mapeado: la carga es casi instantánea y varios procesos comparten las
+    mismas páginas físicas. En CUDA los tensores se copian a la GPU.
+    """
+    path = converted_model_path(name)
+    if not os.path.exists(path):
+        return None
+    try:
+        header, data_start = read_converted_header(path)
+    except (OSError, ValueError) as e:
+        print(f"No se pudo leer el modelo convertido {path}: {e}", file=sys.stderr)
+        return None
+    if header.get("source") != model_source_url(name):
+        # Convertido desde otro checkpoint (p. ej. 'large' apunta ahora a otra versión)
+        return None
+
+    torch = load_torch()
+    whisper = load_whisper()
+    dims = whisper.model.ModelDimensions(**header["dims"])
+    try:
+        with torch.device("meta"):
+            model = whisper.model.Whisper(dims)
+    except (NotImplementedError, RuntimeError):
+        # Versiones de torch sin alguna operación en "meta": se inicializa en CPU y se reemplaza
+        model = whisper.model.Whisper(dims)
+
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    with warnings.catch_warnings():
+        # Los tensores son de solo lectura: la inferencia nunca modifica los pesos
+        warnings.simplefilter("ignore", UserWarning)
+        for tensor_name, entry in header["tensors"].items():
+            dtype = np.dtype(entry["dtype"])
+            start = data_start + entry["offset"]
+            count = int(np.prod(entry["shape"], dtype=np.int64))
+            array = mapped[start:start + count * dtype.itemsize].view(dtype).reshape(entry["shape"])
+            tensor = torch.from_numpy(array)
+            if entry["sparse"]:
+                tensor = tensor.to_sparse()
+            module_name, _, attribute = tensor_name.rpartition(".")
+            module = model.get_submodule(module_name)
+            if attribute in module._parameters:
+                module._parameters[attribute] = torch.nn.Parameter(tensor, requires_grad=False)
+            else:
+                module._buffers[attribute] = tensor
+
+    if any(tensor.is_meta for tensor in model_tensors(model).values()):
+        print(f"El modelo convertido {path} está incompleto; se usa el checkpoint original", file=sys.stderr)
+        return None
+    return model.to(device) if device != "cpu" else model
+
+# Presupuesto de memoria por defecto para la caché de modelos (MB)
+DEFAULT_MODEL_CACHE_MB = int(os.environ.get("VOICE_EXTRACTOR_MODEL_CACHE_MB", "4096"))
+
+class ModelCache:
+    """Caché LRU de modelos Whisper limitada por un presupuesto de memoria.
+
+    Los modelos se indexan por (nombre, dispositivo, precisión). Cuando la
+    memoria estimada de los modelos cargados supera el presupuesto se
+    descargan los menos usados recientemente, conservando siempre el último.
+    La carga se hace fuera del candado: quien pide un modelo que otro hilo
+    está cargando espera solo a ese modelo.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_MODEL_CACHE_MB, verify_checkpoints=DEFAULT_VERIFY_CHECKPOINTS):
+        self.budget_mb = budget_mb
+        self.verify_checkpoints = verify_checkpoints
+        self.hits = 0
+        self.misses = 0
+        self.last_load_time = 0.0
+        self._models = OrderedDict()
+        self._loading = {}  # clave -> threading.Event de la carga en curso
+        self._lock = threading.Lock()
+        self._preload_target = None
+        self._preload_lock = threading.Lock()
+
+    @staticmethod
+    def estimate_size(model):
+        """Estima los bytes que ocupan los pesos de un modelo"""
+        size = 0
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            size += tensor.numel() * tensor.element_size()
+        # Los pesos int8 de las capas cuantizadas no son parámetros ni búferes
+        for module in model.modules():
+            if hasattr(module, "_packed_params") and callable(getattr(module, "weight", None)):
+                weight = module.weight()
+                size += weight.numel() * weight.element_size()
+        return size
+
+    def used_bytes(self):
+        """Memoria estimada ocupada por los modelos en caché"""
+        with self._lock:
+            return self._used_bytes()
+
+    def _used_bytes(self):
+        return sum(size for _, size in self._models.values())
+
+    def get(self, name, device=None, precision=None):
+        """Devuelve (modelo, acierto) cargándolo si no está en caché"""
+        device = device or get_compute_device()
+        precision = precision or default_precision(device)
+        key = (name, device, precision)
+
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    return self._models[key][0], True
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Otro hilo carga este modelo: esperar y volver a mirar (si falló, se reintenta)
+            loading.wait()
+
+        try:
+            start = time.monotonic()
+            model = load_model(name, device, precision, self.verify_checkpoints)
+            load_time = time.monotonic() - start
+            size = self.estimate_size(model)
+        except BaseException:
+            with self._lock:
+                self._loading.pop(key).set()
+            raise
+
+        with self._lock:
+            self.last_load_time = load_time
+            self._models[key] = (model, size)
+            self._loading.pop(key).set()
+            self._evict()
+        return model, False
+
+    def preload(self, name, device=None, precision=None, on_ready=None):
+        """Carga un modelo en un hilo de fondo para que el próximo trabajo lo encuentre listo.
+
+        Solo se atiende la petición más reciente: si se pide otro modelo antes
+        de empezar, la anterior se descarta. `on_ready(nombre, error)` se
+        llama desde el hilo de fondo al terminar.
+        """
+        target = (name, device, precision)
+        self._preload_target = target
+        thread = threading.Thread(target=self._preload_worker, args=(target, on_ready),
+                                  name=f"preload-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _preload_worker(self, target, on_ready):
+        """Hilo de fondo de `preload`, a baja prioridad"""
+        lower_thread_priority()
+        with self._preload_lock:
+            if self._preload_target != target:
+                return
+            try:
+                # El dispositivo se resuelve aquí para no importar torch en el hilo que pide la precarga
+                name, device, precision = target
+                device = device or get_compute_device()
+                self.get(name, device, resolve_precision(precision or "auto", device))
+            except Exception as e:
+                print(f"No se pudo precargar el modelo {target[0]}: {e}", file=sys.stderr)
+                if on_ready:
+                    on_ready(target[0], e)
+                return
+        if on_ready:
+            on_ready(target[0], None)
+
+    def set_budget(self, budget_mb):
+        """Cambia el presupuesto de memoria y expulsa modelos si hace falta"""
+        with self._lock:
+            self.budget_mb = budget_mb
+            self._evict()
+
+    def _evict(self):
+        """Descarga modelos LRU hasta respetar el presupuesto (con el candado tomado)"""
+        budget = self.budget_mb * 1024 * 1024
+        evicted = False
+        while len(self._models) > 1 and self._used_bytes() > budget:
+            self._models.popitem(last=False)
+            evicted = True
+
+        if evicted:
+            gc.collect()
+            torch = load_torch()
+            if torch is not None and torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def keys(self):
+        """Claves de los modelos en caché, de menos a más reciente"""
+        with self._lock:
+            return list(self._models.keys())
+
+    def stats_text(self):
+        """Resumen legible del estado de la caché"""
+        with self._lock:
+            used_mb = self._used_bytes() / (1024 * 1024)
+            return (f"caché: {self.hits} aciertos, {self.misses} fallos, "
+                    f"{len(self._models)} modelos, {used_mb:.0f}/{self.budget_mb} MB")
+
+def detect_language(model, audio, precision="fp32"):
+    """Detecta el idioma en los primeros 30 segundos del audio"""
+    if not model.is_multilingual:
+        return "en", {"en": 1.0}
+
+    whisper = load_whisper()
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels).to(model.device)
+    if precision == "fp16":
+        mel = mel.half()
+    _, probs = model.detect_language(mel)
+    return max(probs, key=probs.get), probs
+
+# Ventanas de 30 s repartidas por el archivo para detectar el idioma
+DEFAULT_LANGUAGE_SAMPLES = 5
+LANGUAGE_SILENCE_RMS = 0.005
+
+def detect_language_sampled(model, audio, samples=DEFAULT_LANGUAGE_SAMPLES, precision="fp32"):
+    """Detecta el idioma promediando varias ventanas repartidas por todo el audio.
+
+    Las ventanas casi en silencio se descartan (salvo que no quede ninguna)
+    y todas se evalúan en un solo lote. Devuelve (idioma, probabilidad
+    media del idioma elegido, probabilidades medias).
+    """
+    if not model.is_multilingual:
+        return "en", 1.0, {"en": 1.0}
+
+    whisper = load_whisper()
+    window = whisper.audio.N_SAMPLES
+    last_start = max(0, len(audio) - window)
+    starts = sorted({int(last_start * i / max(1, samples - 1)) for i in range(samples)})
+    windows = [audio[start:start + window] for start in starts]
+    voiced = [w for w in windows if len(w) and np.sqrt(np.mean(np.square(w))) >= LANGUAGE_SILENCE_RMS]
+    windows = voiced or windows[:1]
+
+    mel = load_torch().stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(w), model.dims.n_mels)
+                              for w in windows]).to(model.device)
+    if precision == "fp16":
+        mel = mel.half()
+    _, window_probs = model.detect_language(mel)
+
+    probs = {}
+    for window_prob in window_probs:
+        for language, probability in window_prob.items():
+            probs[language] = probs.get(language, 0.0) + probability / len(window_probs)
+    language = max(probs, key=probs.get)
+    return language, probs[language], probs
+
+# Clips cortos que se transcriben juntos en un lote (0 o 1 = uno a uno) y duración máxima de un clip corto
+DEFAULT_CLIP_BATCH = int(os.environ.get("VOICE_EXTRACTOR_CLIP_BATCH", "0"))
+SHORT_CLIP_SECONDS = 30
+
+# Ventanas de 30 s que el codificador procesa juntas (1 = una a una, como Whisper)
+DEFAULT_ENCODER_BATCH = int(os.environ.get("VOICE_EXTRACTOR_ENCODER_BATCH", "1"))
+
+# Parámetros del modo largo (transcripción paralela por fragmentos)
+DEFAULT_CHUNK_SECONDS = 600
+CHUNK_OVERLAP_SECONDS = 2.0
+CHUNK_SEARCH_SECONDS = 10.0
+
+def default_worker_count():
+    """Número de procesos por defecto para el modo largo"""
+    return max(1, available_cpu_count() // 4)
+
+def frame_energy(audio, frame_size):
+    """Energía RMS de cada trama de `frame_size` muestras"""
+    count = len(audio) // frame_size
+    frames = audio[:count * frame_size].reshape(count, frame_size)
+    return np.sqrt(np.einsum('ij,ij->i', frames, frames) / frame_size)
+
+def plan_chunks(audio, chunk_seconds, overlap_seconds=CHUNK_OVERLAP_SECONDS,
+                search_seconds=CHUNK_SEARCH_SECONDS, sample_rate=SAMPLE_RATE):
+    """Divide el audio en fragmentos solapados cortados en silencios.
+
+    Cada corte se busca en la trama de menor energía alrededor de la
+    longitud nominal. Devuelve tuplas (inicio, fin, propio_inicio, propio_fin)
+    en muestras: el fragmento abarca [inicio, fin) y es responsable de los
+    segmentos cuyo punto medio cae en [propio_inicio, propio_fin).
+    """
+    total = len(audio)
+    chunk = int(chunk_seconds * sample_rate)
+    search = int(search_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    frame = int(0.02 * sample_rate)
+
+    cuts = [0]
+    while total - cuts[-1] > chunk + search:
+        nominal = cuts[-1] + chunk
+        low = max(cuts[-1] + frame, nominal - search)
+        high = min(total, nominal + search)
+        energy = frame_energy(audio[low:high], frame)
+        cuts.append(low + int(np.argmin(energy)) * frame + frame // 2)
+    cuts.append(total)
+
+    return [
+        (max(0, own_start - overlap), min(total, own_end + overlap), own_start, own_end)
+        for own_start, own_end in zip(cuts[:-1], cuts[1:])
+    ]
+
+def stitch_chunk_segments(chunks, chunk_segments, sample_rate=SAMPLE_RATE):
+    """Une los segmentos de cada fragmento en la línea de tiempo original.
+
+    Los tiempos se desplazan al inicio del fragmento y, en las zonas
+    solapadas, solo se conserva el segmento del fragmento propietario.
+    """
+    segments = []
+    last = len(chunks) - 1
+    for index, ((start, _, own_start, own_end), chunk_result) in enumerate(zip(chunks, chunk_segments)):
+        offset = start / sample_rate
+        for segment in chunk_result:
+            segment = dict(segment)
+            segment["start"] += offset
+            segment["end"] += offset
+            segment["seek"] += start // HOP_LENGTH
+            if segment.get("words"):
+                segment["words"] = [
+                    {**word, "start": word["start"] + offset, "end": word["end"] + offset}
+                    for word in segment["words"]
+                ]
+
+            middle = (segment["start"] + segment["end"]) / 2
+            if own_start / sample_rate <= middle and (middle < own_end / sample_rate or index == last):
+                segments.append(segment)
+
+    for i, segment in enumerate(segments):
+        segment["id"] = i
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+def format_duration(seconds):
+    """Formatea segundos como M:SS o H:MM:SS"""
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+# Tokens que propone el modelo borrador en cada paso de la decodificación especulativa
+DEFAULT_SPECULATIVE_TOKENS = 4
+
+class _OffsetMask:
+    """Máscara causal para varios tokens nuevos sobre una caché KV de `offset` posiciones.
+
+    La atención de Whisper recorta la máscara a [:n, :n], que solo sirve sin
+    caché; este objeto devuelve siempre la máscara (n, offset + n) completa.
+    """
+
+    def __init__(self, mask):
+        self.mask = mask
+
+    def __getitem__(self, index):
+        return self.mask
+
+def decoder_logits(decoder, tokens, audio_features, kv_cache, offset):
+    """Logits del decodificador para `tokens` colocados a partir de la posición `offset`.
+
+    Equivale a `TextDecoder.forward` pero admite varios tokens nuevos a la
+    vez sobre una caché KV ya rellena.
+    """
+    torch = load_torch()
+    count = tokens.shape[-1]
+    x = decoder.token_embedding(tokens) + decoder.positional_embedding[offset:offset + count]
+    x = x.to(audio_features.dtype)
+    mask = torch.full((count, offset + count), float("-inf"), device=x.device).triu_(offset + 1)
+    for block in decoder.blocks:
+        x = block(x, audio_features, mask=_OffsetMask(mask), kv_cache=kv_cache)
+    x = decoder.ln(x)
+    return (x @ torch.transpose(decoder.token_embedding.weight.to(x.dtype), 0, 1)).float()
+
+def truncate_kv_cache(model, kv_cache, length):
+    """Descarta de la caché KV de autoatención las posiciones a partir de `length`"""
+    for block in model.decoder.blocks:
+        for module in (block.attn.key, block.attn.value):
+            if module in kv_cache:
+                kv_cache[module] = kv_cache[module][:, :length]
+
+def speculative_compatible(model, draft):
+    """Indica si `draft` puede proponer tokens a `model` (mismo vocabulario y espectrograma)"""
+    return (draft is not None and draft is not model
+            and draft.dims.n_vocab == model.dims.n_vocab and draft.dims.n_mels == model.dims.n_mels)
+
+def speculative_decode(model, draft, audio_features, draft_features, options,
+                       lookahead=DEFAULT_SPECULATIVE_TOKENS):
+    """Decodificación voraz especulativa de una ventana.
+
+    `draft` propone hasta `lookahead` tokens y `model` los verifica en una
+    sola pasada: se aceptan mientras coincidan con su propio argmax (tras
+    los mismos filtros de logits que `whisper.decode`) y el primero que no
+    coincide se sustituye por el de `model`. El resultado es el de la
+    decodificación voraz normal. Devuelve (DecodingResult, tokens propuestos,
+    tokens aceptados).
+    """
+    torch = load_torch()
+    whisper = load_whisper()
+    from whisper.decoding import DecodingResult, DecodingTask
+    from whisper.utils import compression_ratio
+
+    task = DecodingTask(model, options)
+    tokenizer = task.tokenizer
+    eot = tokenizer.eot
+    n_ctx = model.dims.n_text_ctx
+    features = audio_features.unsqueeze(0) if audio_features.ndim == 2 else audio_features
+    draft_features = draft_features.unsqueeze(0) if draft_features.ndim == 2 else draft_features
+    device = features.device
+
+    def choose(logits, context):
+        """Token voraz y su log-probabilidad tras aplicar los filtros de Whisper"""
+        logits = logits.clone().unsqueeze(0)
+        context = torch.tensor([context], device=device)
+        for logit_filter in task.logit_filters:
+            logit_filter.apply(logits, context)
+        token = logits.argmax(dim=-1).item()
+        return token, torch.log_softmax(logits.float(), dim=-1)[0, token].item()
+
+    tokens = list(task.initial_tokens)
+    target_cache, target_hooks = model.install_kv_cache_hooks()
+    draft_cache, draft_hooks = draft.install_kv_cache_hooks()
+    target_length = draft_length = 0  # posiciones guardadas en cada caché
+    sum_logprob = 0.0
+    no_speech_prob = float("nan")
+    proposed = accepted = 0
+    # Las versiones de Whisper con SDPA usan una máscara causal que no admite desplazamiento
+    sdpa_off = getattr(whisper.model, "disable_sdpa", contextlib.nullcontext)
+    try:
+        with torch.no_grad(), sdpa_off():
+            while True:
+                generated = len(tokens) - task.sample_begin
+                room = min(task.sample_len - generated, n_ctx - len(tokens)) - 1
+
+                # El borrador propone tokens de uno en uno con su propia caché
+                proposals = []
+                feed = tokens[draft_length:]
+                while len(proposals) < min(lookahead, room):
+                    logits = decoder_logits(draft.decoder, torch.tensor([feed], device=device),
+                                            draft_features, draft_cache, draft_length)
+                    draft_length += len(feed)
+                    token, _ = choose(logits[0, -1], tokens + proposals)
+                    proposals.append(token)
+                    if token == eot:
+                        break
+                    feed = [token]
+
+                # El modelo grande verifica todas las propuestas en una sola pasada
+                feed = tokens[target_length:] + proposals
+                logits = decoder_logits(model.decoder, torch.tensor([feed], device=device),
+                                        features, target_cache, target_length)
+                if target_length == 0 and tokenizer.no_speech is not None:
+                    no_speech_prob = logits[0, task.sot_index].softmax(dim=-1)[tokenizer.no_speech].item()
+                first = len(tokens) - target_length - 1
+                decided = len(tokens)
+                proposed += len(proposals)
+
+                finished = False
+                for j in range(len(proposals) + 1):
+                    token, logprob = choose(logits[0, first + j], tokens)
+                    tokens.append(token)
+                    sum_logprob += logprob
+                    generated += 1
+                    matched = j < len(proposals) and token == proposals[j]
+                    accepted += matched
+                    if token == eot or generated >= task.sample_len or len(tokens) > n_ctx:
+                        finished = True
+                        break
+                    if not matched:
+                        break
+                if finished:
+                    break
+
+                # Solo quedan en caché las posiciones de los tokens ya decididos
+                target_length = min(len(tokens) - 1, decided + len(proposals))
+                truncate_kv_cache(model, target_cache, target_length)
+                draft_length = min(draft_length, len(tokens) - 1)
+                truncate_kv_cache(draft, draft_cache, draft_length)
+    finally:
+        for hook in target_hooks + draft_hooks:
+            hook.remove()
+
+    if tokens[-1] != eot:
+        tokens.append(eot)
+    text_tokens = tokens[task.sample_begin:tokens.index(eot, task.sample_begin)]
+    text = tokenizer.decode(text_tokens).strip()
+    result = DecodingResult(
+        audio_features=audio_features,
+        language=options.language,
+        tokens=text_tokens,
+        text=text,
+        avg_logprob=sum_logprob / (len(text_tokens) + 1),
+        no_speech_prob=no_speech_prob,
+        temperature=options.temperature,
+        compression_ratio=compression_ratio(text),
+    )
+    return result, proposed, accepted
+
+class StreamingTranscriber:
+    """Transcripción por ventanas de 30 s que entrega segmentos a medida que se decodifican.
+
+    Reproduce el bucle largo de `whisper.transcribe` (avance por marcas de
+    tiempo, temperaturas de respaldo, condicionamiento con el texto previo y
+    marcas por palabra) pero como generador: `windows()` devuelve los
+    segmentos nuevos de cada ventana y `result()` el diccionario final con la
+    misma estructura que `transcribe`.
+
+    Con `encoder_batch` > 1 las ventanas siguen una rejilla fija de 30 s
+    (el segmento inacabado de cada ventana se conserva en lugar de volver a
+    decodificarse) para que el codificador procese `encoder_batch` ventanas
+    a la vez; el decodificador usa después las características guardadas.
+    """
+
+    def __init__(self, model, audio, *, language=None, fp16=False,
+                 temperature=(0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+                 compression_ratio_threshold=2.4, logprob_threshold=-1.0,
+                 no_speech_threshold=0.6, condition_on_previous_text=True,
+                 initial_prompt=None, word_timestamps=False,
+                 prepend_punctuations="\"'“¿([{-",
+                 append_punctuations="\"'.。,，!！?？:：”)]}、",
+                 timer=None, speculative_draft=None, speculative_tokens=DEFAULT_SPECULATIVE_TOKENS,
+                 encoder_batch=1, **decode_options):
+        whisper = load_whisper()
+        torch = load_torch()
+        if whisper is None or torch is None:
+            raise Exception("No se pudo cargar el módulo Whisper")
+
+        from whisper.audio import N_FRAMES, N_SAMPLES, log_mel_spectrogram
+        from whisper.tokenizer import get_tokenizer
+
+        self.model = model
+        self.timer = timer or StageTimer()
+        self.temperature = temperature
+        self.compression_ratio_threshold = compression_ratio_threshold
+        self.logprob_threshold = logprob_threshold
+        self.no_speech_threshold = no_speech_threshold
+        self.condition_on_previous_text = condition_on_previous_text
+        self.word_timestamps = word_timestamps
+        self.prepend_punctuations = prepend_punctuations
+        self.append_punctuations = append_punctuations
+        # Decodificación especulativa: solo con un borrador compatible
+        self.speculative_draft = speculative_draft if speculative_compatible(model, speculative_draft) else None
+        self.speculative_tokens = speculative_tokens
+        self.speculative_proposed = 0
+        self.speculative_accepted = 0
+        self.encoder_batch = max(1, encoder_batch)
+        self.encoded = {}  # características ya calculadas por posición de ventana
+
+        fp16 = fp16 and model.device.type != "cpu"
+        self.dtype = torch.float16 if fp16 else torch.float32
+        self.decode_options = dict(decode_options, fp16=fp16)
+
+        # Se añaden 30 s de silencio para poder recortar la última ventana
+        with self.timer.stage("mel"):
+            self.mel = log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
+        self.content_frames = self.mel.shape[-1] - N_FRAMES
+
+        if language is None:
+            if not model.is_multilingual:
+                language = "en"
+            else:
+                with self.timer.stage("language_detection"):
+                    _, probs = model.detect_language(self.window_mel(0))
+                language = max(probs, key=probs.get)
+        self.language = language
+        self.decode_options["language"] = language
+
+        self.tokenizer = get_tokenizer(
+            model.is_multilingual,
+            num_languages=model.num_languages,
+            language=language,
+            task=self.decode_options.get("task", "transcribe"),
+        )
+
+        self.input_stride = N_FRAMES // model.dims.n_audio_ctx
+        self.time_precision = self.input_stride * HOP_LENGTH / SAMPLE_RATE
+        self.seek = 0
+        self.all_tokens = []
+        self.all_segments = []
+        self.prompt_reset_since = 0
+        self.last_speech_timestamp = 0.0
+
+        if initial_prompt is not None:
+            self.initial_prompt_tokens = self.tokenizer.encode(" " + initial_prompt.strip())
+            self.all_tokens.extend(self.initial_prompt_tokens)
+        else:
+            self.initial_prompt_tokens = []
+
+    @property
+    def total_seconds(self):
+        """Duración total del audio en segundos"""
+        return self.content_frames * HOP_LENGTH / SAMPLE_RATE
+
+    @property
+    def processed_seconds(self):
+        """Segundos de audio ya procesados"""
+        return min(self.seek, self.content_frames) * HOP_LENGTH / SAMPLE_RATE
+
+    def window_mel(self, seek):
+        """Espectrograma de la ventana de 30 s que empieza en `seek`"""
+        from whisper.audio import N_FRAMES, pad_or_trim
+        mel_segment = self.mel[:, seek:seek + N_FRAMES]
+        return pad_or_trim(mel_segment, N_FRAMES).to(self.model.device).to(self.dtype)
+
+    def _synchronize(self):
+        """Espera a la GPU para que las mediciones de tiempo sean exactas"""
+        if self.model.device.type == "cuda":
+            load_torch().cuda.synchronize()
+
+    def encode(self, mel_segment, seek=None):
+        """Ejecuta el codificador sobre una ventana y devuelve sus características.
+
+        Con `encoder_batch` > 1 se codifican de una vez la ventana de `seek` y
+        las siguientes de la rejilla, que quedan guardadas para su turno.
+        """
+        if self.encoder_batch > 1 and seek is not None:
+            from whisper.audio import N_FRAMES
+            if seek not in self.encoded:
+                torch = load_torch()
+                seeks = [position for position in range(seek, seek + self.encoder_batch * N_FRAMES, N_FRAMES)
+                         if position < self.content_frames]
+                with self.timer.stage("encoder"):
+                    features = self.model.embed_audio(torch.stack([self.window_mel(position) for position in seeks]))
+                    self._synchronize()
+                self.encoded = dict(zip(seeks, features))
+            return self.encoded.pop(seek)
+        with self.timer.stage("encoder"):
+            audio_features = self.model.embed_audio(mel_segment.unsqueeze(0))[0]
+            self._synchronize()
+        return audio_features
+
+    def decode_with_fallback(self, mel_segment, seek=None):
+        """Decodifica una ventana subiendo la temperatura si el resultado falla.
+
+        El codificador se ejecuta una sola vez por ventana y sus
+        características se reutilizan en cada temperatura de respaldo.
+        """
+        from whisper.decoding import DecodingOptions
+
+        temperatures = [self.temperature] if isinstance(self.temperature, (int, float)) else self.temperature
+        decode_result = None
+        audio_features = self.encode(mel_segment, seek)
+        draft_features = None
+
+        self.last_fallbacks = 0
+        for attempt, t in enumerate(temperatures):
+            if attempt:
+                self.last_fallbacks = attempt
+                if self.timer.tracer:
+                    self.timer.tracer.instant("fallback", temperature=t)
+            kwargs = {**self.decode_options}
+            if t > 0:
+                # Sin búsqueda en haz cuando se muestrea
+                kwargs.pop("beam_size", None)
+                kwargs.pop("patience", None)
+            else:
+                kwargs.pop("best_of", None)
+
+            if (self.speculative_draft is not None and t == 0 and kwargs.get("language")
+                    and not kwargs.get("beam_size")):
+                # Voraz: el borrador propone y el modelo verifica, con el mismo resultado
+                if draft_features is None:
+                    with self.timer.stage("draft_encoder"):
+                        draft_features = self.speculative_draft.embed_audio(mel_segment.unsqueeze(0))[0]
+                with self.timer.stage("decoder"):
+                    decode_result, proposed, accepted = speculative_decode(
+                        self.model, self.speculative_draft, audio_features, draft_features,
+                        DecodingOptions(**kwargs, temperature=t), self.speculative_tokens)
+                    self._synchronize()
+                self.speculative_proposed += proposed
+                self.speculative_accepted += accepted
+            else:
+                with self.timer.stage("decoder"):
+                    decode_result = self.model.decode(audio_features, DecodingOptions(**kwargs, temperature=t))
+                    self._synchronize()
+
+            needs_fallback = False
+            if (self.compression_ratio_threshold is not None
+                    and decode_result.compression_ratio > self.compression_ratio_threshold):
+                needs_fallback = True  # demasiado repetitivo
+            if (self.logprob_threshold is not None
+                    and decode_result.avg_logprob < self.logprob_threshold):
+                needs_fallback = True  # probabilidad media demasiado baja
+            if (self.no_speech_threshold is not None
+                    and decode_result.no_speech_prob > self.no_speech_threshold):
+                needs_fallback = False  # silencio
+            if not needs_fallback:
+                break
+
+        return decode_result
+
+    def _new_segment(self, seek, start, end, tokens, result):
+        """Construye un segmento con el formato de `transcribe`"""
+        tokens = tokens.tolist()
+        text_tokens = [token for token in tokens if token < self.tokenizer.eot]
+        return {
+            "seek": seek,
+            "start": start,
+            "end": end,
+            "text": self.tokenizer.decode(text_tokens),
+            "tokens": tokens,
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob,
+        }
+
+    def _trace_window(self, seek, started, result, segments):
+        """Registra una ventana en la línea de tiempo con sus datos de decodificación"""
+        if self.timer.tracer:
+            self.timer.tracer.complete(
+                "window", started, time.monotonic() - started, "window",
+                start=round(seek * HOP_LENGTH / SAMPLE_RATE, 2), temperature=result.temperature,
+                fallbacks=self.last_fallbacks, segments=len(segments),
+                no_speech_prob=round(result.no_speech_prob, 3))
+
+    def windows(self):
+        """Generador que procesa ventana a ventana y devuelve los segmentos nuevos"""
+        from whisper.audio import FRAMES_PER_SECOND, N_FRAMES
+        from whisper.timing import add_word_timestamps
+        torch = load_torch()
+        tokenizer = self.tokenizer
+
+        while self.seek < self.content_frames:
+            seek = self.seek
+            window_started = time.monotonic()
+            time_offset = float(seek * HOP_LENGTH / SAMPLE_RATE)
+            segment_size = min(N_FRAMES, self.content_frames - seek)
+            segment_duration = segment_size * HOP_LENGTH / SAMPLE_RATE
+            mel_segment = self.window_mel(seek)
+
+            self.decode_options["prompt"] = self.all_tokens[self.prompt_reset_since:]
+            result = self.decode_with_fallback(mel_segment, seek)
+            postprocess_started = time.monotonic()
+            tokens = torch.tensor(result.tokens)
+
+            if self.no_speech_threshold is not None:
+                # Ventana sin voz: saltar al siguiente bloque
+                should_skip = result.no_speech_prob > self.no_speech_threshold
+                if self.logprob_threshold is not None and result.avg_logprob > self.logprob_threshold:
+                    should_skip = False
+                if should_skip:
+                    self.seek += segment_size
+                    self.timer.add("postprocess", time.monotonic() - postprocess_started)
+                    self._trace_window(seek, window_started, result, [])
+                    yield []
+                    continue
+
+            current_segments = []
+            timestamp_tokens = tokens.ge(tokenizer.timestamp_begin)
+            single_timestamp_ending = timestamp_tokens[-2:].tolist() == [False, True]
+
+            consecutive = torch.where(timestamp_tokens[:-1] & timestamp_tokens[1:])[0]
+            consecutive.add_(1)
+            if len(consecutive) > 0:
+                # La salida contiene pares de marcas de tiempo consecutivas
+                slices = consecutive.tolist()
+                if single_timestamp_ending:
+                    slices.append(len(tokens))
+
+                last_slice = 0
+                for current_slice in slices:
+                    sliced_tokens = tokens[last_slice:current_slice]
+                    start_pos = sliced_tokens[0].item() - tokenizer.timestamp_begin
+                    end_pos = sliced_tokens[-1].item() - tokenizer.timestamp_begin
+                    current_segments.append(self._new_segment(
+                        seek,
+                        time_offset + start_pos * self.time_precision,
+                        time_offset + end_pos * self.time_precision,
+                        sliced_tokens, result))
+                    last_slice = current_slice
+
+                if single_timestamp_ending:
+                    # Una sola marca al final: no hay voz después
+                    self.seek += segment_size
+                elif self.encoder_batch > 1:
+                    # Rejilla fija: el segmento inacabado termina con la ventana
+                    if last_slice < len(tokens) and (tokens[last_slice:] < tokenizer.eot).any():
+                        start_pos = tokens[last_slice].item() - tokenizer.timestamp_begin
+                        current_segments.append(self._new_segment(
+                            seek, time_offset + max(start_pos, 0) * self.time_precision,
+                            time_offset + segment_duration, tokens[last_slice:], result))
+                    self.seek += segment_size
+                else:
+                    # Ignorar el segmento inacabado y avanzar hasta la última marca
+                    last_timestamp_pos = tokens[last_slice - 1].item() - tokenizer.timestamp_begin
+                    self.seek += last_timestamp_pos * self.input_stride
+            else:
+                duration = segment_duration
+                timestamps = tokens[timestamp_tokens.nonzero().flatten()]
+                if len(timestamps) > 0 and timestamps[-1].item() != tokenizer.timestamp_begin:
+                    last_timestamp_pos = timestamps[-1].item() - tokenizer.timestamp_begin
+                    duration = last_timestamp_pos * self.time_precision
+
+                current_segments.append(self._new_segment(
+                    seek, time_offset, time_offset + duration, tokens, result))
+                self.seek += segment_size
+
+            if self.word_timestamps:
+                word_started = time.monotonic()
+                add_word_timestamps(
+                    segments=current_segments,
+                    model=self.model,
+                    tokenizer=tokenizer,
+                    mel=mel_segment,
+                    num_frames=segment_size,
+                    prepend_punctuations=self.prepend_punctuations,
+                    append_punctuations=self.append_punctuations,
+                    last_speech_timestamp=self.last_speech_timestamp,
+                )
+                word_end_timestamps = [w["end"] for s in current_segments for w in s["words"]]
+                if len(word_end_timestamps) > 0:
+                    self.last_speech_timestamp = word_end_timestamps[-1]
+                if not single_timestamp_ending and len(word_end_timestamps) > 0 and self.encoder_batch == 1:
+                    seek_shift = round((word_end_timestamps[-1] - time_offset) * FRAMES_PER_SECOND)
+                    if seek_shift > 0:
+                        self.seek = seek + seek_shift
+                word_time = time.monotonic() - word_started
+                postprocess_started += word_time
+                self.timer.add("word_timestamps", word_time)
+
+            # Vaciar segmentos instantáneos o sin texto
+            for segment in current_segments:
+                if segment["start"] == segment["end"] or segment["text"].strip() == "":
+                    segment["text"] = ""
+                    segment["tokens"] = []
+                    segment["words"] = []
+
+            new_segments = [
+                {"id": i, **segment}
+                for i, segment in enumerate(current_segments, start=len(self.all_segments))
+            ]
+            self.all_segments.extend(new_segments)
+            self.all_tokens.extend([token for segment in current_segments for token in segment["tokens"]])
+
+            if not self.condition_on_previous_text or result.temperature > 0.5:
+                # No usar como contexto lo generado con temperatura alta
+                self.prompt_reset_since = len(self.all_tokens)
+
+            self.timer.add("postprocess", time.monotonic() - postprocess_started)
+            self._trace_window(seek, window_started, result, new_segments)
+            yield new_segments
+
+    def state(self):
+        """Estado serializable del bucle para guardarlo en un punto de control"""
+        return {
+            "seek": self.seek,
+            "all_tokens": list(self.all_tokens),
+            "all_segments": list(self.all_segments),
+            "prompt_reset_since": self.prompt_reset_since,
+            "last_speech_timestamp": self.last_speech_timestamp,
+            "initial_prompt_tokens": list(self.initial_prompt_tokens),
+            "language": self.language,
+        }
+
+    def restore(self, state):
+        """Continúa el bucle desde un estado guardado con `state()`"""
+        self.seek = state["seek"]
+        self.all_tokens = list(state["all_tokens"])
+        self.all_segments = list(state["all_segments"])
+        self.prompt_reset_since = state["prompt_reset_since"]
+        self.last_speech_timestamp = state["last_speech_timestamp"]
+        self.initial_prompt_tokens = list(state["initial_prompt_tokens"])
+
+    def result(self):
+        """Resultado acumulado con la estructura de `transcribe`"""
+        return {
+            "text": self.tokenizer.decode(self.all_tokens[len(self.initial_prompt_tokens):]),
+            "segments": self.all_segments,
+            "language": self.language,
+        }
+
+def transcribe_streaming(model, audio, on_window=None, resume_state=None, **options):
+    """Transcribe llamando a `on_window(segmentos, transcriptor)` tras cada ventana.
+
+    Con `resume_state` (obtenido de `StreamingTranscriber.state()`) la
+    transcripción continúa desde la última ventana completada.
+    """
+    if resume_state is not None:
+        options["language"] = resume_state["language"]
+    transcriber = StreamingTranscriber(model, audio, **options)
+    if resume_state is not None:
+        transcriber.restore(resume_state)
+    for segments in transcriber.windows():
+        if on_window:
+            on_window(segments, transcriber)
+    return transcriber.result()
+
+def transcribe_clip_batch(model, clips, language=None, fp16=False, timer=None, **decode_options):
+    """Transcribe varios clips de hasta 30 s con una sola pasada por lotes.
+
+    Cada clip se rellena hasta 30 s y sus espectrogramas pasan juntos por el
+    codificador y el decodificador. Con `language` None el idioma se detecta
+    por clip. Los clips cuyo resultado falla los umbrales de respaldo se
+    repiten por separado con `transcribe_streaming`. Devuelve una lista de
+    resultados con la estructura de `transcribe`, en el mismo orden.
+    """
+    whisper = load_whisper()
+    torch = load_torch()
+    if whisper is None or torch is None:
+        raise Exception("No se pudo cargar el módulo Whisper")
+
+    from whisper.audio import N_SAMPLES, log_mel_spectrogram, pad_or_trim
+    from whisper.decoding import DecodingOptions
+
+    timer = timer or StageTimer()
+    if language is None and not model.is_multilingual:
+        # Los modelos ".en" no tienen tokens de idioma que detectar
+        language = "en"
+    temperature = decode_options.get("temperature", FALLBACK_TEMPERATURES)
+    temperature = temperature if isinstance(temperature, (int, float)) else temperature[0]
+    compression_ratio_threshold = decode_options.get("compression_ratio_threshold", 2.4)
+    logprob_threshold = decode_options.get("logprob_threshold", -1.0)
+    no_speech_threshold = decode_options.get("no_speech_threshold", 0.6)
+    fp16 = fp16 and model.device.type != "cpu"
+
+    # Espectrograma por clip: la normalización de Whisper depende del máximo de cada uno
+    with timer.stage("mel"):
+        mel = torch.stack([log_mel_spectrogram(pad_or_trim(clip, N_SAMPLES), model.dims.n_mels) for clip in clips])
+        mel = mel.to(model.device).to(torch.float16 if fp16 else torch.float32)
+    with timer.stage("encoder"):
+        features = model.embed_audio(mel)
+    options = {"beam_size": decode_options.get("beam_size")} if temperature == 0 else {}
+    with timer.stage("decoder"):
+        decoded = model.decode(features, DecodingOptions(language=language, fp16=fp16, temperature=temperature,
+                                                         without_timestamps=True, **options))
+
+    results = []
+    for clip, result in zip(clips, decoded):
+        silent = (no_speech_threshold is not None and result.no_speech_prob > no_speech_threshold
+                  and not (logprob_threshold is not None and result.avg_logprob > logprob_threshold))
+        failed = ((compression_ratio_threshold is not None and result.compression_ratio > compression_ratio_threshold)
+                  or (logprob_threshold is not None and result.avg_logprob < logprob_threshold))
+        if failed and not silent:
+            # Reintento individual con las temperaturas de respaldo
+            results.append(transcribe_streaming(model, clip, language=result.language, fp16=fp16,
+                                                timer=timer, **decode_options))
+            continue
+        segments = []
+        if result.text and not silent:
+            segments.append({
+                "id": 0, "seek": 0, "start": 0.0, "end": len(clip) / SAMPLE_RATE,
+                "text": " " + result.text, "tokens": list(result.tokens),
+                "temperature": result.temperature, "avg_logprob": result.avg_logprob,
+                "compression_ratio": result.compression_ratio, "no_speech_prob": result.no_speech_prob,
+            })
+        results.append({"text": "".join(segment["text"] for segment in segments),
+                        "segments": segments, "language": result.language})
+    return results
+
+# Modo cascada: borrador con un modelo rápido y repaso de los segmentos dudosos
+DEFAULT_DRAFT_MODEL = "tiny"
+CASCADE_LOGPROB_THRESHOLD = -0.7
+CASCADE_COMPRESSION_THRESHOLD = 2.2
+CASCADE_NO_SPEECH_THRESHOLD = 0.5
+CASCADE_MERGE_GAP_SECONDS = 1.0
+CASCADE_PADDING_SECONDS = 0.5
+CASCADE_PROMPT_CHARS = 200
+
+def needs_refinement(segment, logprob_threshold, compression_threshold, no_speech_threshold):
+    """Indica si un segmento del borrador es poco fiable y debe repetirse con el modelo grande"""
+    if not segment["text"].strip():
+        return False
+    return (segment["avg_logprob"] < logprob_threshold
+            or segment["compression_ratio"] > compression_threshold
+            or segment["no_speech_prob"] > no_speech_threshold)
+
+def plan_refinement(segments, total_seconds, logprob_threshold=CASCADE_LOGPROB_THRESHOLD,
+                    compression_threshold=CASCADE_COMPRESSION_THRESHOLD,
+                    no_speech_threshold=CASCADE_NO_SPEECH_THRESHOLD):
+    """Regiones (inicio, fin) en segundos a repetir, uniendo segmentos dudosos cercanos"""
+    regions = []
+    for segment in segments:
+        if not needs_refinement(segment, logprob_threshold, compression_threshold, no_speech_threshold):
+            continue
+        start = max(0.0, segment["start"] - CASCADE_PADDING_SECONDS)
+        end = min(total_seconds, segment["end"] + CASCADE_PADDING_SECONDS)
+        if regions and start - regions[-1][1] <= CASCADE_MERGE_GAP_SECONDS:
+            regions[-1][1] = max(regions[-1][1], end)
+        else:
+            regions.append([start, end])
+    return [(start, end) for start, end in regions if end > start]
+
+def shift_segment(segment, seconds):
+    """Copia de un segmento con sus tiempos desplazados `seconds` segundos"""
+    segment = dict(segment, start=segment["start"] + seconds, end=segment["end"] + seconds)
+    segment["seek"] += int(seconds * SAMPLE_RATE) // HOP_LENGTH
+    if segment.get("words"):
+        segment["words"] = [
+            {**word, "start": word["start"] + seconds, "end": word["end"] + seconds}
+            for word in segment["words"]
+        ]
+    return segment
+
+def merge_refined_segments(draft_segments, refined):
+    """Sustituye los segmentos del borrador de cada región por los del modelo grande.
+
+    `refined` es una lista de ((inicio, fin), segmentos ya desplazados). Un
+    segmento pertenece a la región que contiene su punto medio, así que el
+    margen añadido alrededor de cada región no duplica texto.
+    """
+    def inside(segment):
+        middle = (segment["start"] + segment["end"]) / 2
+        return any(start <= middle < end for (start, end), _ in refined)
+
+    segments = [segment for segment in draft_segments if not inside(segment)]
+    for (start, end), region_segments in refined:
+        segments.extend(segment for segment in region_segments
+                        if start <= (segment["start"] + segment["end"]) / 2 < end)
+    segments.sort(key=lambda segment: segment["start"])
+    segments = [dict(segment, id=i) for i, segment in enumerate(segments)]
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+# Parámetros de la detección de voz por energía
+VAD_FRAME_SECONDS = 0.03
+VAD_MIN_SPEECH_SECONDS = 0.25
+VAD_MIN_SILENCE_SECONDS = 0.6
+VAD_PADDING_SECONDS = 0.2
+
+def detect_speech_regions(audio, sample_rate=SAMPLE_RATE):
+    """Detecta las regiones con voz a partir de la energía de cada trama.
+
+    El umbral se adapta al suelo de ruido del archivo (percentil 10 de la
+    energía en dB) sin superar nunca 20 dB por debajo de las tramas más
+    fuertes. Los huecos cortos se rellenan, las detecciones muy breves se
+    descartan y cada región se amplía con un pequeño margen. Devuelve una
+    lista de (inicio, fin) en muestras.
+    """
+    frame = int(VAD_FRAME_SECONDS * sample_rate)
+    if len(audio) < frame:
+        return []
+
+    energy_db = 20 * np.log10(frame_energy(audio, frame) + 1e-10)
+    noise_floor = np.percentile(energy_db, 10)
+    loud = np.percentile(energy_db, 95)
+    threshold = max(-60.0, min(noise_floor + 12.0, loud - 20.0))
+    speech = energy_db > threshold
+
+    # Agrupar tramas consecutivas con voz en regiones
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    min_silence = VAD_MIN_SILENCE_SECONDS / VAD_FRAME_SECONDS
+    min_speech = VAD_MIN_SPEECH_SECONDS / VAD_FRAME_SECONDS
+    padding = int(VAD_PADDING_SECONDS * sample_rate)
+
+    merged = []
+    for start, end in zip(starts, ends):
+        if merged and start - merged[-1][1] < min_silence:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    regions = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start = max(0, int(start) * frame - padding)
+        end = min(len(audio), int(end) * frame + padding)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+def compact_speech(audio, regions, sample_rate=SAMPLE_RATE):
+    """Concatena las regiones con voz y devuelve (audio, tabla de tiempos).
+
+    La tabla contiene tuplas (inicio_compacto, inicio_original, duración) en
+    segundos para poder devolver los tiempos a la línea original.
+    """
+    pieces = []
+    timeline = []
+    position = 0
+    for start, end in regions:
+        pieces.append(audio[start:end])
+        timeline.append((position / sample_rate, start / sample_rate, (end - start) / sample_rate))
+        position += end - start
+
+    if not pieces:
+        return np.zeros(0, dtype=np.float32), timeline
+    return np.concatenate(pieces), timeline
+
+def map_to_original(timeline, starts, seconds, is_end=False):
+    """Convierte un instante del audio compacto al audio original
+
+    `starts` son los inicios compactos de `timeline`, calculados una sola vez
+    por el llamador.
+    """
+    if is_end:
+        # Un final justo en la frontera pertenece a la región anterior
+        index = bisect.bisect_left(starts, seconds) - 1
+    else:
+        index = bisect.bisect_right(starts, seconds) - 1
+    compact_start, original_start, duration = timeline[max(0, index)]
+    return original_start + min(max(0.0, seconds - compact_start), duration)
+
+def remap_segments(result, timeline):
+    """Devuelve los tiempos de los segmentos a la línea de tiempo original"""
+    if not timeline:
+        return result
+
+    starts = [compact_start for compact_start, _, _ in timeline]
+    for segment in result["segments"]:
+        seek_seconds = segment["seek"] * HOP_LENGTH / SAMPLE_RATE
+        segment["seek"] = int(map_to_original(timeline, starts, seek_seconds) * SAMPLE_RATE / HOP_LENGTH)
+        segment["start"] = map_to_original(timeline, starts, segment["start"])
+        segment["end"] = map_to_original(timeline, starts, segment["end"], is_end=True)
+        for word in segment.get("words") or []:
+            word["start"] = map_to_original(timeline, starts, word["start"])
+            word["end"] = map_to_original(timeline, starts, word["end"], is_end=True)
+    return result
+
+# Modelo de cada proceso del modo largo
+_worker_model = None
+
+def _init_chunk_worker(model_name, device, precision, threads, cpu_slices, slot_counter):
+    """Inicializa un proceso del modo largo con su propio modelo, hilos y núcleos.
+
+    Con `cpu_slices` cada proceso toma un grupo de núcleos distinto antes de
+    que torch cree sus hilos, que heredan la afinidad.
+    """
+    global _worker_model
+    if cpu_slices:
+        with slot_counter.get_lock():
+            slot = slot_counter.value
+            slot_counter.value += 1
+        set_cpu_affinity(cpu_slices[slot % len(cpu_slices)])
+    apply_torch_threads(threads, 1)
+    _worker_model = load_model(model_name, device, precision)
+
+def _transcribe_chunk(index, audio, options):
+    """Transcribe un fragmento dentro de un proceso del modo largo"""
+    result = _worker_model.transcribe(audio, **options)
+    return index, result["segments"]
+
+def split_cpus(cpus, parts):
+    """Reparte una lista de núcleos en `parts` grupos contiguos sin solaparse"""
+    parts = max(1, min(parts, len(cpus)))
+    size, extra = divmod(len(cpus), parts)
+    slices, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        slices.append(cpus[start:end])
+        start = end
+    return slices
+
+def transcribe_parallel(audio, model_name, device, precision, language,
+                        workers, chunk_seconds=DEFAULT_CHUNK_SECONDS, on_progress=None,
+                        completed=None, on_chunk_done=None, cpu_settings=None, decode_options=None):
+    """Transcribe audio largo repartiendo fragmentos entre varios procesos.
+
+    Devuelve un diccionario con la misma estructura que `transcribe`
+    (text, segments, language). El idioma debe estar ya decidido para que
+    todos los fragmentos lo compartan. `completed` ({índice: segmentos})
+    permite saltar fragmentos ya transcritos y `on_chunk_done(índice,
+    segmentos)` se llama al terminar cada uno. Con `cpu_settings` (ver
+    `resolve_cpu_settings`) cada proceso se fija a su propio grupo de
+    núcleos y los hilos de torch se reparten entre los procesos.
+    `decode_options` (ver `preset_decode_options`) se pasa a cada fragmento.
+    """
+    chunks = plan_chunks(audio, chunk_seconds)
+    chunk_segments = [None] * len(chunks)
+    for index, segments in (completed or {}).items():
+        if 0 <= index < len(chunks):
+            chunk_segments[index] = segments
+    pending = [i for i, segments in enumerate(chunk_segments) if segments is None]
+
+    if pending:
+        workers = max(1, min(workers, len(pending)))
+        cpus = cpu_settings["cpus"] if cpu_settings else None
+        cpu_slices = split_cpus(cpus, workers) if cpus else None
+        threads = max(1, (cpu_settings["torch_threads"] if cpu_settings else available_cpu_count()) // workers)
+        if cpu_slices:
+            threads = min(threads, min(len(group) for group in cpu_slices))
+        options = dict(decode_options or {}, language=language, fp16=precision == "fp16")
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_chunk_worker,
+                                 initargs=(model_name, device, precision, threads, cpu_slices,
+                                           context.Value('i', 0))) as pool:
+            futures = [
+                pool.submit(_transcribe_chunk, i, audio[chunks[i][0]:chunks[i][1]], options)
+                for i in pending
+            ]
+            for future in as_completed(futures):
+                index, segments = future.result()
+                chunk_segments[index] = segments
+                if on_chunk_done:
+                    on_chunk_done(index, segments)
+                if on_progress:
+                    done = sum(1 for segments in chunk_segments if segments is not None)
+                    on_progress(done, len(chunks))
+
+    result = stitch_chunk_segments(chunks, chunk_segments)
+    result["language"] = language
+    return result
+
+def get_cache_dir(*parts):
+    """Directorio de caché de la aplicación (VOICE_EXTRACTOR_CACHE_DIR para cambiarlo)"""
+    base = os.environ.get("VOICE_EXTRACTOR_CACHE_DIR")
+    if not base:
+        root = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+        base = os.path.join(root, "voice_extractor")
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def file_content_hash(path, block_size=4 * 1024 * 1024):
+    """Hash BLAKE2b del contenido completo de un archivo"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def evict_lru_files(paths, budget_bytes):
+    """Borra los archivos usados hace más tiempo hasta respetar el presupuesto"""
+    entries = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= budget_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    return total
+
+# Cuota de disco por defecto de la caché de audio decodificado (MB)
+DEFAULT_AUDIO_CACHE_MB = int(os.environ.get("VOICE_EXTRACTOR_AUDIO_CACHE_MB", "4096"))
+
+class AudioCache:
+    """Caché en disco del audio decodificado como arrays .npy abiertos con memmap.
+
+    Cada archivo se indexa por ruta, tamaño y fecha de modificación. Al
+    reutilizarlo se mapea en memoria (copia en escritura), así que volver a
+    transcribir con otro modelo o idioma empieza al instante y apenas ocupa
+    memoria residente. La cuota de disco se respeta expulsando los arrays
+    usados hace más tiempo.
+    """
+
+    def __init__(self, directory=None, budget_mb=DEFAULT_AUDIO_CACHE_MB):
+        self.directory = directory or get_cache_dir("audio")
+        os.makedirs(self.directory, exist_ok=True)
+        self.budget_mb = budget_mb
+
+    def _entry_path(self, path, sample_rate):
+        stat = os.stat(path)
+        material = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{sample_rate}"
+        key = hashlib.sha1(material.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def load(self, path, sample_rate=SAMPLE_RATE):
+        """Devuelve el audio mapeado en memoria (o None si no está en caché)"""
+        entry = self._entry_path(path, sample_rate)
+        try:
+            audio = np.load(entry, mmap_mode='c')
+            os.utime(entry)
+            return audio
+        except (OSError, ValueError):
+            return None
+
+    def store(self, path, audio, sample_rate=SAMPLE_RATE):
+        """Guarda el audio decodificado y expulsa entradas si se supera la cuota"""
+        budget = self.budget_mb * 1024 * 1024
+        if audio.nbytes > budget:
+            return
+
+        entry = self._entry_path(path, sample_rate)
+        temp_path = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, audio)
+        os.replace(temp_path, entry)
+
+        evict_lru_files(glob.glob(os.path.join(self.directory, "*.npy")), budget)
+
+# Segundos entre puntos de control durante una transcripción
+CHECKPOINT_INTERVAL_SECONDS = 30
+
+class CheckpointStore:
+    """Puntos de control de transcripciones largas para poder reanudarlas.
+
+    Cada trabajo guarda en un JSON los segmentos completados y la posición
+    del audio (o los fragmentos terminados en el modo largo) bajo la misma
+    clave que la caché de resultados: solo se reanuda con el mismo archivo,
+    modelo y opciones. El punto de control se borra al terminar el trabajo.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or get_cache_dir("checkpoints")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.checkpoint.json")
+
+    def load(self, key):
+        """Devuelve el punto de control guardado (o None)"""
+        try:
+            with open(self._entry_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key, state):
+        """Guarda un punto de control de forma atómica"""
+        path = self._entry_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, default=float)
+        os.replace(temp_path, path)
+
+    def discard(self, key):
+        """Borra el punto de control de un trabajo terminado"""
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+# Temperaturas de respaldo por defecto de Whisper
+FALLBACK_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+# Ajustes de decodificación con nombre (velocidad frente a precisión);
+# "balanced" son los valores por defecto de `whisper.transcribe`
+DECODING_PRESETS = {
+    "fastest": {
+        "beam_size": None, "best_of": None, "temperature": (0.0,),
+        "compression_ratio_threshold": 2.4, "logprob_threshold": -1.0, "no_speech_threshold": 0.6,
+        "condition_on_previous_text": False, "word_timestamps": False,
+    },
+    "balanced": {
+        "beam_size": None, "best_of": None, "temperature": FALLBACK_TEMPERATURES,
+        "compression_ratio_threshold": 2.4, "logprob_threshold": -1.0, "no_speech_threshold": 0.6,
+        "condition_on_previous_text": True, "word_timestamps": False,
+    },
+    "accurate": {
+        "beam_size": 5, "best_of": 5, "temperature": FALLBACK_TEMPERATURES,
+        "compression_ratio_threshold": 2.4, "logprob_threshold": -1.0, "no_speech_threshold": 0.6,
+        "condition_on_previous_text": True, "word_timestamps": True,
+    },
+}
+DEFAULT_PRESET = "balanced"
+
+PRESET_DESCRIPTIONS = {
+    "fastest": "voraz, sin temperaturas de respaldo ni contexto del texto previo",
+    "balanced": "valores por defecto de Whisper",
+    "accurate": "búsqueda en haz de 5, 5 candidatos por temperatura y marcas por palabra",
+}
+
+def preset_decode_options(name):
+    """Opciones de decodificación de un preset para `transcribe_streaming` y `model.transcribe`"""
+    if name not in DECODING_PRESETS:
+        raise Exception(f"Preset de decodificación desconocido: {name}")
+    return {key: value for key, value in DECODING_PRESETS[name].items() if value is not None}
+
+# Presupuesto por defecto de la caché de resultados (MB)
+DEFAULT_RESULT_CACHE_MB = int(os.environ.get("VOICE_EXTRACTOR_RESULT_CACHE_MB", "512"))
+
+# Opciones que cambian el resultado y por tanto forman parte de la clave
+RESULT_CACHE_KEY_OPTIONS = ("model", "precision", "language", "language_model", "language_samples", "vad",
+                            "parallel", "chunk_seconds",
+                            "cascade", "draft_model", "refine_logprob", "refine_compression_ratio",
+                            "refine_no_speech", "preset", "encoder_batch", "clip_batch")
+
+# Opciones que solo cuentan en la clave cuando el modo cascada está activo
+CASCADE_KEY_OPTIONS = ("cascade", "draft_model", "refine_logprob", "refine_compression_ratio", "refine_no_speech")
+
+class ResultCache:
+    """Caché en disco de transcripciones indexada por el contenido del archivo.
+
+    La clave combina un hash del contenido completo (una copia idéntica
+    comparte entrada) con el modelo, el idioma y las opciones de
+    decodificación. El hash se guarda en disco por ruta, tamaño y fecha de
+    modificación, así que cada archivo se lee una sola vez. Cada entrada es
+    un JSON con el resultado completo; el tamaño total se limita expulsando
+    las entradas usadas hace más tiempo.
+    """
+
+    VERSION = 3
+
+    def __init__(self, directory=None, budget_mb=DEFAULT_RESULT_CACHE_MB):
+        self.directory = directory or get_cache_dir("results")
+        os.makedirs(self.directory, exist_ok=True)
+        self.hash_directory = os.path.join(self.directory, "hashes")
+        os.makedirs(self.hash_directory, exist_ok=True)
+        self.budget_mb = budget_mb
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def content_hash(self, path):
+        """Hash del contenido, memorizado por ruta, tamaño y fecha de modificación"""
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if memo_key in self._hashes:
+                return self._hashes[memo_key]
+
+        material = "|".join(str(part) for part in memo_key)
+        hash_path = os.path.join(self.hash_directory, hashlib.sha1(material.encode('utf-8')).hexdigest())
+        try:
+            with open(hash_path, 'r', encoding='utf-8') as f:
+                content_hash = f.read().strip()
+        except OSError:
+            content_hash = ""
+        if len(content_hash) != 40:
+            content_hash = file_content_hash(path)
+            temp_path = f"{hash_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(content_hash)
+                os.replace(temp_path, hash_path)
+            except OSError as e:
+                print(f"No se pudo guardar el hash de {path}: {e}", file=sys.stderr)
+
+        with self._lock:
+            self._hashes[memo_key] = content_hash
+        return content_hash
+
+    def key_for(self, path, options):
+        """Clave de caché de un archivo con unas opciones"""
+        relevant = {name: options.get(name) for name in RESULT_CACHE_KEY_OPTIONS}
+        if not relevant["parallel"]:
+            relevant.pop("chunk_seconds")
+        if relevant["precision"] != "int8":
+            # Las claves de fp32/fp16 se mantienen como antes de existir int8
+            relevant.pop("precision")
+        if relevant["language"] != "auto" or not relevant["language_model"]:
+            relevant.pop("language_model")
+            relevant.pop("language_samples")
+        if not relevant["cascade"]:
+            for name in CASCADE_KEY_OPTIONS:
+                relevant.pop(name)
+        if relevant["preset"] in (None, DEFAULT_PRESET):
+            # "balanced" decodifica como antes de existir los presets
+            relevant.pop("preset")
+        if relevant["parallel"] or options.get("cascade") or (relevant["encoder_batch"] or 1) <= 1:
+            # Solo la rejilla fija del codificador por lotes cambia los segmentos
+            relevant.pop("encoder_batch")
+        if (relevant["clip_batch"] or 0) > 1:
+            # Un clip da el mismo resultado en cualquier lote, sea cual sea su tamaño;
+            # el camino por lotes no usa las opciones de los demás modos
+            relevant["clip_batch"] = True
+            for name in ("parallel", "chunk_seconds", "encoder_batch", "vad", "language_model", "language_samples",
+                         *CASCADE_KEY_OPTIONS):
+                relevant.pop(name, None)
+        else:
+            relevant.pop("clip_batch")
+        material = json.dumps([self.VERSION, self.content_hash(path), relevant], sort_keys=True)
+        return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Devuelve el resultado guardado (o None) y lo marca como usado"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(path)
+            return result
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        """Guarda un resultado y expulsa entradas antiguas si se supera el presupuesto"""
+        path = self._entry_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, default=float)
+        os.replace(temp_path, path)
+
+        entries = glob.glob(os.path.join(self.directory, "*.json"))
+        evict_lru_files(entries, self.budget_mb * 1024 * 1024)
+
+# Opciones por defecto del pipeline de extracción
+DEFAULT_OPTIONS = {
+    "model": "base",
+    "preset": DEFAULT_PRESET,
+    "language": "auto",
+    "language_model": "",
+    "language_samples": DEFAULT_LANGUAGE_SAMPLES,
+    "cascade": False,
+    "speculative": False,
+    "speculative_tokens": DEFAULT_SPECULATIVE_TOKENS,
+    "draft_model": DEFAULT_DRAFT_MODEL,
+    "refine_logprob": CASCADE_LOGPROB_THRESHOLD,
+    "refine_compression_ratio": CASCADE_COMPRESSION_THRESHOLD,
+    "refine_no_speech": CASCADE_NO_SPEECH_THRESHOLD,
+    "vad": False,
+    "parallel": False,
+    "workers": default_worker_count(),
+    "chunk_seconds": DEFAULT_CHUNK_SECONDS,
+    "encoder_batch": DEFAULT_ENCODER_BATCH,
+    "clip_batch": DEFAULT_CLIP_BATCH,
+    "result_cache": True,
+    "audio_cache": False,
+    "checkpoint": True,
+    "precision": "auto",
+    "trace": False,
+    "profile": False,
+    "torch_profile": False,
+    "torch_threads": DEFAULT_TORCH_THREADS,
+    "interop_threads": DEFAULT_INTEROP_THREADS,
+    "ffmpeg_threads": DEFAULT_FFMPEG_THREADS,
+    "cpu_affinity": DEFAULT_CPU_AFFINITY,
+}
+
+def clip_batching_applies(options):
+    """Indica si los clips cortos pueden transcribirse en micro-lotes con estas opciones.
+
+    El camino por lotes no aplica VAD, cascada, decodificación especulativa,
+    modelo de detección de idioma ni marcas por palabra, y no se traza ni se
+    perfila: con cualquiera de ellos cada archivo va por `run`.
+    """
+    options = dict(DEFAULT_OPTIONS, **options)
+    return (options["clip_batch"] > 1
+            and not (options["vad"] or options["cascade"] or options["speculative"]
+                     or (options["language"] == "auto" and options["language_model"])
+                     or options["trace"] or options["profile"] or options["torch_profile"]
+                     or preset_decode_options(options["preset"]).get("word_timestamps")))
+
+def summary_text(info):
+    """Resumen legible de la información de un trabajo terminado"""
+    if info.get("result_cached"):
+        return "♻️ resultado recuperado de la caché"
+    if info["model_cached"]:
+        parts = [f"modelo '{info['model']}' desde caché"]
+    else:
+        parts = [f"modelo '{info['model']}' cargado en {info['load_time']:.1f}s"]
+    parts.append(info["cache_stats"])
+    if info.get("language_probability") is not None:
+        parts.append(f"idioma: {info['language']} ({info['language_probability']:.0%})")
+    if info.get("refined_fraction") is not None:
+        parts.append(f"repasado con '{info['model']}': {info['refined_fraction']:.0%} del audio")
+    if info.get("clip_batch"):
+        parts.append(f"en un lote de {info['clip_batch']} clips")
+    if info.get("accepted_token_rate") is not None:
+        parts.append(f"tokens del borrador aceptados: {info['accepted_token_rate']:.0%}")
+    if info.get("skipped_seconds") is not None:
+        total = info["audio_seconds"]
+        percent = 100 * info["skipped_seconds"] / total if total else 0
+        parts.append(f"silencio omitido: {info['skipped_seconds']:.1f}s ({percent:.0f}%)")
+    return "; ".join(parts)
+
+def diagnostics_base_for(path, kind):
+    """Ruta base (sin extensión) de los diagnósticos de un trabajo en la carpeta de caché"""
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(get_cache_dir(kind), f"{base_name}_{time.strftime('%Y%m%d_%H%M%S')}")
+
+def metrics_path():
+    """Archivo JSONL donde se acumulan las métricas de cada trabajo"""
+    return os.path.join(get_cache_dir("metrics"), "metrics.jsonl")
+
+def append_job_metrics(info, path=None, extra_timings=None):
+    """Añade una línea JSON con los tiempos por etapa de un trabajo terminado"""
+    timings = dict(info.get("timings") or {})
+    for name, seconds in (extra_timings or {}).items():
+        timings[name] = round(seconds, 4)
+    record = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "file": info.get("file"),
+        "extension": os.path.splitext(info.get("file") or "")[1].lower(),
+        "model": info.get("model"),
+        "device": info.get("device"),
+        "precision": info.get("precision"),
+        "preset": info.get("preset"),
+        "encoder_batch": info.get("encoder_batch"),
+        "clip_batch": info.get("clip_batch"),
+        "vad": info.get("vad", False),
+        "parallel": info.get("parallel", False),
+        "cascade": info.get("cascade", False),
+        "speculative": info.get("speculative", False),
+        "torch_threads": info.get("torch_threads"),
+        "language": info.get("language"),
+        "result_cached": info.get("result_cached", False),
+        "model_cached": info.get("model_cached", False),
+        "audio_seconds": info.get("audio_seconds"),
+        "rtf": (round(info["transcribe_time"] / info["audio_seconds"], 4)
+                if info.get("transcribe_time") and info.get("audio_seconds") else None),
+        "refined_fraction": info.get("refined_fraction"),
+        "accepted_token_rate": info.get("accepted_token_rate"),
+        "elapsed": info.get("elapsed"),
+        "peak_rss_mb": info.get("peak_rss_mb") and round(info["peak_rss_mb"], 1),
+        "timings": timings,
+    }
+    path = path or metrics_path()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return record
+
+def measured_preset_rtf(path=None):
+    """RTF mediano de las ejecuciones registradas por (preset, modelo, dispositivo, precisión).
+
+    Devuelve {(preset, modelo, dispositivo, precisión): (rtf mediano, número
+    de ejecuciones)}. Solo cuentan las transcripciones normales: los
+    resultados de la caché, el VAD, la cascada, la decodificación
+    especulativa, el modo largo y los lotes de ventanas o de clips miden otra
+    cosa. Los registros anteriores a esos campos se ignoran.
+    """
+    samples = {}
+    try:
+        with open(path or metrics_path(), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if (record.get("result_cached") or not record.get("rtf") or not record.get("preset")
+                        or "cascade" not in record):
+                    continue
+                if (record.get("vad") or record.get("cascade") or record.get("speculative") or record.get("parallel")
+                        or (record.get("encoder_batch") or 1) > 1 or record.get("clip_batch")):
+                    continue
+                key = (record["preset"], record.get("model"), record.get("device"), record.get("precision"))
+                samples.setdefault(key, []).append(record["rtf"])
+    except OSError:
+        return {}
+    return {key: (float(np.median(values)), len(values)) for key, values in samples.items()}
+
+def preset_summary(preset, model, measured, device=None, precision="auto"):
+    """Descripción de un preset con el RTF medido para un modelo, dispositivo y precisión.
+
+    Sin `device` (aún no se conoce) se usa la combinación con más ejecuciones.
+    """
+    text = PRESET_DESCRIPTIONS[preset]
+    if device is not None:
+        key = (preset, model, device, resolve_precision(precision, device))
+        candidates = [key] if key in measured else []
+    else:
+        candidates = sorted((key for key in measured if key[:2] == (preset, model)),
+                            key=lambda key: measured[key][1], reverse=True)
+    if candidates:
+        _, _, device, precision = candidates[0]
+        rtf, runs = measured[candidates[0]]
+        return f"{text} · RTF medido con '{model}' ({device}, {precision}): {rtf:.2f} ({runs} ejecuciones)"
+    return f"{text} · sin mediciones con '{model}' todavía"
+
+# Número de funciones y operadores en el resumen del perfilado
+PROFILE_TOP_N = 20
+PROFILE_SEPARATOR = "\n\n" + "─" * 40 + "\n"
+
+def profile_call(func, output_base, use_torch=False, top=PROFILE_TOP_N):
+    """Ejecuta `func()` bajo cProfile y, si se pide, bajo torch.profiler (CPU).
+
+    Guarda `<base>.prof` (para snakeviz/pstats), `<base>_hotspots.txt` y, con
+    torch, `<base>_torch_ops.txt` con la tabla de operadores. Devuelve
+    (resultado, resumen de los puntos calientes, rutas guardadas). Los
+    archivos se escriben también si `func` falla.
+    """
+    profiler = cProfile.Profile()
+    torch_context = contextlib.nullcontext()
+    if use_torch:
+        load_torch()
+        from torch.profiler import ProfilerActivity, profile
+        torch_context = profile(activities=[ProfilerActivity.CPU])
+
+    directory = os.path.dirname(output_base)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    paths = []
+    lines = []
+    try:
+        with torch_context as torch_profile:
+            profiler.enable()
+            try:
+                result = func()
+            finally:
+                profiler.disable()
+    finally:
+        paths.append(output_base + ".prof")
+        profiler.dump_stats(paths[-1])
+
+        # Funciones con más tiempo propio
+        stats = pstats.Stats(profiler)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+        lines.append(f"🔥 Funciones con más tiempo propio (top {top}):")
+        lines.append(f"{'propio':>9} {'acumulado':>10} {'llamadas':>9}  función")
+        for (filename, line, name), (_, calls, own, cumulative, _) in rows:
+            location = f"{os.path.basename(filename)}:{line}" if line else filename
+            lines.append(f"{own:8.2f}s {cumulative:9.2f}s {calls:9d}  {name} ({location})")
+
+        if use_torch:
+            averages = torch_profile.key_averages()
+            paths.append(output_base + "_torch_ops.txt")
+            with open(paths[-1], 'w', encoding='utf-8') as f:
+                f.write(averages.table(sort_by="self_cpu_time_total", row_limit=top * 5))
+            operators = sorted(averages, key=lambda event: event.self_cpu_time_total, reverse=True)[:top]
+            lines.append("")
+            lines.append(f"🧮 Operadores de torch con más tiempo de CPU (top {top}):")
+            for event in operators:
+                lines.append(f"{event.self_cpu_time_total / 1e6:8.2f}s {event.count:9d}  {event.key}")
+
+        paths.append(output_base + "_hotspots.txt")
+        with open(paths[-1], 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n\n")
+            stats.stream = f
+            stats.sort_stats("cumulative").print_stats(top * 5)
+
+    return result, "\n".join(lines), paths
+
+class ExtractionPipeline:
+    """Pipeline de extracción compartido por la interfaz gráfica y la línea de comandos.
+
+    `run` recibe la ruta, un diccionario de opciones (ver DEFAULT_OPTIONS) y
+    una función `emit(tipo, datos)` que recibe eventos "status" (texto),
+    "progress" (porcentaje), "segments" (segmentos nuevos de cada ventana) y
+    "stage" (diccionario con etapa, segundos y total acumulado). Los tiempos
+    de cada etapa quedan en `info["timings"]`.
+    Los modelos se mantienen cargados entre trabajos en la caché compartida.
+    """
+
+    def __init__(self, model_cache=None, result_cache=None, audio_cache=None, checkpoints=None):
+        self.model_cache = model_cache or ModelCache()
+        self.result_cache = result_cache or ResultCache()
+        self.audio_cache = audio_cache or AudioCache()
+        self.checkpoints = checkpoints or CheckpointStore()
+        # Whisper instala ganchos de caché KV en el modelo al decodificar, así
+        # que la inferencia se serializa aunque haya varios trabajos en curso
+        self.inference_lock = threading.Lock()
+
+    def prepare_audio_file(self, path, use_cache=False, emit=None, timer=None, threads=0):
+        """Decodifica el archivo a un array de audio, reutilizando la caché si se pide"""
+        timer = timer or StageTimer()
+        with timer.span("prepare_audio_file", file=os.path.basename(path), use_cache=use_cache):
+            if use_cache:
+                audio = self.audio_cache.load(path)
+                if audio is not None:
+                    if emit:
+                        emit("status", "💽 Audio decodificado recuperado de la caché")
+                    return audio
+
+            audio = decode_audio(path, timer=timer, threads=threads)
+            if use_cache:
+                self.audio_cache.store(path, audio)
+            return audio
+
+    def run(self, path, options, emit, tracer=None, prepared=None):
+        """Transcribe un archivo y devuelve (resultado, información del trabajo).
+
+        Con `tracer` (TraceRecorder) las etapas y ventanas se registran en
+        una línea de tiempo exportable con `tracer.save`. `prepared` es
+        (audio, segundos de decodificación) si el audio ya se decodificó.
+        """
+        # Un archivo suelto se transcribe siempre ventana a ventana (ver `run_batch`)
+        options = dict(DEFAULT_OPTIONS, **options)
+        options["clip_batch"] = 0
+        job_started = time.monotonic()
+        timer = StageTimer(lambda name, seconds, total: emit(
+            "stage", {"stage": name, "seconds": seconds, "total": total}), tracer)
+
+        # La huella del archivo y las opciones identifica el trabajo en las cachés
+        job_key = None
+        if options["result_cache"] or options["checkpoint"]:
+            emit("status", "🔎 Calculando la huella del archivo...")
+            with timer.stage("hash"):
+                job_key = self.result_cache.key_for(path, options)
+
+        # Buscar primero un resultado idéntico en la caché de resultados
+        if options["result_cache"]:
+            outcome = self.cached_outcome(path, options, job_key, emit, timer, job_started)
+            if outcome is not None:
+                return outcome
+
+        emit("status", "🔄 Cargando modelo de IA...")
+        emit("progress", 10)
+
+        with timer.stage("import"):
+            load_torch()
+            load_whisper()
+        cpu_settings = resolve_cpu_settings(options)
+        apply_torch_threads(cpu_settings["torch_threads"], cpu_settings["interop_threads"])
+
+        # Obtener el modelo de la caché (se carga solo si no está)
+        model_name = options["model"]
+        device = get_compute_device()
+        precision = resolve_precision(options["precision"], device)
+        detector = None
+        detector_precision = resolve_precision("auto", device)
+        draft = None
+        with timer.stage("model_load"):
+            # Los modelos auxiliares se piden antes para que el principal quede como el más reciente
+            if options["language"] == "auto" and options["language_model"]:
+                detector, _ = self.model_cache.get(options["language_model"], device, detector_precision)
+            if (options["cascade"] or options["speculative"]) and options["draft_model"] != model_name:
+                draft, _ = self.model_cache.get(options["draft_model"], device, precision)
+            model, cache_hit = self.model_cache.get(model_name, device, precision)
+
+        info = {
+            "file": path,
+            "model": model_name,
+            "preset": options["preset"],
+            "encoder_batch": 1 if options["parallel"] or options["cascade"] else max(1, options["encoder_batch"]),
+            "vad": options["vad"],
+            "parallel": options["parallel"],
+            "cascade": options["cascade"],
+            "model_cached": cache_hit,
+            "result_cached": False,
+            "device": device,
+            "precision": precision,
+            "load_time": 0.0 if cache_hit else self.model_cache.last_load_time,
+            "cache_stats": self.model_cache.stats_text(),
+            "skipped_seconds": None,
+            "torch_threads": cpu_settings["torch_threads"],
+            "ffmpeg_threads": cpu_settings["ffmpeg_threads"],
+        }
+        emit("status", f"⚡ Usando {summary_text(info)}")
+
+        emit("status", "🎬 Preparando archivo de audio...")
+        emit("progress", 30)
+
+        # Decodificar el audio (de video o audio) directamente a memoria
+        if prepared is not None:
+            audio, info["decode_time"] = prepared
+        else:
+            stage_started = time.monotonic()
+            audio = self.prepare_audio_file(path, options["audio_cache"], emit, timer,
+                                            cpu_settings["ffmpeg_threads"])
+            info["decode_time"] = time.monotonic() - stage_started
+        info["audio_seconds"] = len(audio) / SAMPLE_RATE
+
+        emit("status", "🧠 Procesando con IA Whisper...")
+        emit("progress", 50)
+
+        # Omitir silencios: transcribir solo las regiones con voz
+        timeline = None
+        if options["vad"]:
+            with timer.stage("vad"):
+                audio, timeline = compact_speech(audio, detect_speech_regions(audio))
+            skipped = info["audio_seconds"] - len(audio) / SAMPLE_RATE
+            info["skipped_seconds"] = skipped
+            emit("status", f"🔇 Silencio omitido: {skipped:.1f}s de {info['audio_seconds']:.1f}s")
+
+        # Transcribir
+        language = None if options["language"] == "auto" else options["language"]
+
+        # Idioma decidido una vez con un modelo pequeño sobre varias ventanas
+        if detector is not None and model.is_multilingual and len(audio):
+            emit("status", f"🌍 Detectando idioma con '{options['language_model']}'...")
+            with timer.stage("language_detection"):
+                language, probability, _ = detect_language_sampled(
+                    detector, audio, options["language_samples"], detector_precision)
+            info["language"] = language
+            info["language_probability"] = probability
+            emit("status", f"🌍 Idioma detectado: {language} ({probability:.0%})")
+
+        if len(audio) == 0:
+            result = {"text": "", "segments": [], "language": language}
+        else:
+            emit("status", "⏳ Esperando al modelo...")
+            checkpoint_key = job_key if options["checkpoint"] else None
+            speculative = self.speculative_options(model, draft, options, emit)
+            info["speculative"] = bool(speculative)
+            speculative_stats = {}
+            wait_started = time.monotonic()
+            with self.inference_lock:
+                stage_started = time.monotonic()
+                if tracer:
+                    tracer.complete("wait_inference_lock", wait_started, stage_started - wait_started, "span")
+                with timer.span("transcribe", parallel=options["parallel"], cascade=options["cascade"],
+                                speculative=bool(speculative)):
+                    if draft is not None and options["cascade"]:
+                        result, refined_seconds = self.transcribe_cascade(
+                            draft, model, audio, precision, language, options, emit, timer, speculative)
+                        info["refined_seconds"] = refined_seconds
+                        info["refined_fraction"] = refined_seconds / (len(audio) / SAMPLE_RATE)
+                    else:
+                        result = self.transcribe(model, audio, model_name, device, precision,
+                                                 language, options, emit, checkpoint_key, timer,
+                                                 speculative, speculative_stats)
+                info["transcribe_time"] = time.monotonic() - stage_started
+            if speculative_stats.get("proposed"):
+                info["accepted_token_rate"] = speculative_stats["accepted"] / speculative_stats["proposed"]
+
+        if timeline is not None:
+            remap_segments(result, timeline)
+
+        if options["result_cache"]:
+            self.result_cache.put(job_key, result)
+        if options["checkpoint"]:
+            self.checkpoints.discard(job_key)
+
+        emit("progress", 90)
+        info["language"] = result["language"]
+        info["timings"] = timer.as_dict()
+        info["elapsed"] = time.monotonic() - job_started
+        info["peak_rss_mb"] = peak_rss_mb()
+        return result, info
+
+    def run_batch(self, paths, options, emits):
+        """Transcribe varios clips cortos juntos con micro-lotes entre archivos.
+
+        `emits` tiene una función `emit(tipo, datos)` por archivo. Los clips de
+        hasta `SHORT_CLIP_SECONDS` se decodifican en paralelo y pasan juntos
+        por el codificador y el decodificador (`transcribe_clip_batch`); los
+        que resultan más largos se transcriben con `run`. Devuelve una lista
+        con (resultado, información) o la excepción de cada archivo.
+        """
+        options = dict(DEFAULT_OPTIONS, **options)
+        outcomes = [None] * len(paths)
+        single_options = dict(options, clip_batch=0)
+        decode_options = preset_decode_options(options["preset"])
+        if not clip_batching_applies(options):
+            # Opciones que el camino por lotes no aplica: uno a uno
+            for index, (path, emit) in enumerate(zip(paths, emits)):
+                try:
+                    outcomes[index] = self.run(path, single_options, emit)
+                except Exception as e:
+                    outcomes[index] = e
+            return outcomes
+
+        batch_started = time.monotonic()
+        timers = [StageTimer(lambda name, seconds, total, emit=emit: emit(
+            "stage", {"stage": name, "seconds": seconds, "total": total})) for emit in emits]
+
+        # Resultados ya guardados en la caché
+        keys = [None] * len(paths)
+        pending = []
+        for index, (path, emit, timer) in enumerate(zip(paths, emits, timers)):
+            try:
+                if options["result_cache"]:
+                    with timer.stage("hash"):
+                        keys[index] = self.result_cache.key_for(path, options)
+                    outcomes[index] = self.cached_outcome(path, options, keys[index], emit, timer, batch_started)
+                if outcomes[index] is None:
+                    pending.append(index)
+            except Exception as e:
+                outcomes[index] = e
+        if not pending:
+            return outcomes
+
+        with timers[pending[0]].stage("import"):
+            load_torch()
+            load_whisper()
+        cpu_settings = resolve_cpu_settings(options)
+        apply_torch_threads(cpu_settings["torch_threads"], cpu_settings["interop_threads"])
+        device = get_compute_device()
+        precision = resolve_precision(options["precision"], device)
+        with timers[pending[0]].stage("model_load"):
+            model, cache_hit = self.model_cache.get(options["model"], device, precision)
+        load_time = 0.0 if cache_hit else self.model_cache.last_load_time
+
+        # Decodificar el audio de todos los clips a la vez (un FFmpeg por archivo)
+        def prepare(index):
+            emits[index]("status", "🎬 Preparando archivo de audio...")
+            started = time.monotonic()
+            audio = self.prepare_audio_file(paths[index], options["audio_cache"], emits[index], timers[index],
+                                            cpu_settings["ffmpeg_threads"])
+            return audio, time.monotonic() - started
+
+        audios = {}
+        with ThreadPoolExecutor(max_workers=min(len(pending), available_cpu_count())) as pool:
+            futures = {pool.submit(prepare, index): index for index in pending}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    audios[index] = future.result()
+                except Exception as e:
+                    outcomes[index] = e
 
-def load_torch():
-    """Carga el módulo torch de forma diferida"""
-    global torch_module
-    if torch_module is None:
+        short = [index for index in pending
+                 if index in audios and 0 < len(audios[index][0]) <= SHORT_CLIP_SECONDS * SAMPLE_RATE]
+        for index in pending:
+            if index in audios and index not in short:
+                # Clip largo (o vacío): el camino normal lo resuelve sin volver a decodificarlo
+                try:
+                    outcomes[index] = self.run(paths[index], single_options, emits[index],
+                                               prepared=audios.pop(index))
+                except Exception as e:
+                    outcomes[index] = e
+        if not short:
+            return outcomes
+
+        for index in short:
+            emits[index]("status", f"📦 Transcribiendo en un lote de {len(short)} clips...")
+            emits[index]("progress", 50)
+        language = None if options["language"] == "auto" else options["language"]
+        batch_timer = StageTimer()
         try:
-            import torch
-            torch_module = torch
-        except ImportError as e:
-            print(f"Error cargando PyTorch: {e}")
+            with self.inference_lock:
+                stage_started = time.monotonic()
+                results = transcribe_clip_batch(model, [audios[index][0] for index in short], language,
+                                                precision == "fp16", batch_timer, **decode_options)
+                transcribe_time = time.monotonic() - stage_started
+        except Exception as e:
+            for index in short:
+                outcomes[index] = e
+            return outcomes
+
+        total_seconds = sum(len(audios[index][0]) for index in short) / SAMPLE_RATE
+        for index, result in zip(short, results):
+            audio, decode_time = audios[index]
+            audio_seconds = len(audio) / SAMPLE_RATE
+            emits[index]("segments", result["segments"])
+            if options["result_cache"]:
+                self.result_cache.put(keys[index], result)
+            emits[index]("progress", 90)
+            timings = timers[index].as_dict()
+            for name, seconds in batch_timer.as_dict().items():
+                # Las etapas del lote se reparten según la duración de cada clip
+                timings[name] = round(seconds * audio_seconds / total_seconds, 4)
+            outcomes[index] = (result, {
+                "file": paths[index],
+                "model": options["model"],
+                "preset": options["preset"],
+                "encoder_batch": 1,
+                "clip_batch": len(short),
+                "vad": False,
+                "parallel": False,
+                "cascade": False,
+                "speculative": False,
+                "model_cached": cache_hit,
+                "result_cached": False,
+                "device": device,
+                "precision": precision,
+                "load_time": load_time,
+                "cache_stats": self.model_cache.stats_text(),
+                "skipped_seconds": None,
+                "torch_threads": cpu_settings["torch_threads"],
+                "ffmpeg_threads": cpu_settings["ffmpeg_threads"],
+                "decode_time": decode_time,
+                "audio_seconds": audio_seconds,
+                "transcribe_time": transcribe_time * audio_seconds / total_seconds,
+                "language": result["language"],
+                "timings": timings,
+                "elapsed": time.monotonic() - batch_started,
+                "peak_rss_mb": peak_rss_mb(),
+            })
+        return outcomes
+
+    def cached_outcome(self, path, options, job_key, emit, timer, job_started):
+        """(resultado, información) guardados en la caché de resultados, o None"""
+        result = self.result_cache.get(job_key)
+        if result is None:
             return None
-    return torch_module
+        emit("status", "♻️ Resultado recuperado de la caché")
+        emit("segments", result["segments"])
+        emit("progress", 90)
+        info = {
+            "file": path,
+            "model": options["model"],
+            "model_cached": False,
+            "result_cached": True,
+            "load_time": 0.0,
+            "language": result["language"],
+            "audio_seconds": None,
+            "skipped_seconds": None,
+            "timings": timer.as_dict(),
+            "elapsed": time.monotonic() - job_started,
+        }
+        return result, info
+
+    def speculative_options(self, model, draft, options, emit):
+        """Argumentos de decodificación especulativa para `transcribe_streaming` ({} si no se usa)"""
+        if not options["speculative"] or draft is None:
+            return {}
+        if not speculative_compatible(model, draft):
+            emit("status", f"⚠️ '{options['draft_model']}' no comparte vocabulario con '{options['model']}': "
+                           "decodificación normal")
+            return {}
+        return {"speculative_draft": draft, "speculative_tokens": options["speculative_tokens"]}
+
+    def transcribe_cascade(self, draft, model, audio, precision, language, options, emit, timer,
+                           speculative=None):
+        """Transcribe con el modelo borrador y repite con `model` solo los segmentos dudosos.
+
+        Los umbrales de `avg_logprob`, `compression_ratio` y `no_speech_prob`
+        se leen de las opciones. Devuelve (resultado combinado, segundos de
+        audio repetidos con el modelo grande). El modo cascada no usa puntos
+        de control ni el modo largo. Con `speculative` el repaso usa además
+        el borrador para la decodificación especulativa.
+        """
+        fp16 = precision == "fp16"
+        total = len(audio) / SAMPLE_RATE
+        decode_options = preset_decode_options(options["preset"])
+
+        def on_draft_window(segments, transcriber):
+            emit("segments", segments)
+            done = transcriber.processed_seconds
+            emit("status", f"📝 Borrador con '{options['draft_model']}': {format_duration(done)} / {format_duration(total)}")
+            emit("progress", 50 + 20 * done / total if total else 70)
+
+        with timer.span("cascade_draft", model=options["draft_model"]):
+            draft_result = transcribe_streaming(draft, audio, on_draft_window,
+                                                language=language, fp16=fp16, timer=timer, **decode_options)
+        language = draft_result["language"]
+
+        regions = plan_refinement(draft_result["segments"], total, options["refine_logprob"],
+                                  options["refine_compression_ratio"], options["refine_no_speech"])
+        refined_seconds = sum(end - start for start, end in regions)
+        emit("status", f"🔍 Repasando {len(regions)} regiones dudosas ({refined_seconds / total:.0%} del audio) "
+                       f"con '{options['model']}'...")
+
+        refined = []
+        done = 0.0
+        for start, end in regions:
+            # El texto anterior del borrador sirve de contexto al modelo grande
+            previous = "".join(segment["text"] for segment in draft_result["segments"] if segment["end"] <= start)
+            with timer.span("cascade_refine", start=round(start, 2), end=round(end, 2)):
+                region_result = transcribe_streaming(
+                    model, audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)], language=language,
+                    fp16=fp16, initial_prompt=previous[-CASCADE_PROMPT_CHARS:].strip() or None, timer=timer,
+                    **decode_options, **(speculative or {}))
+            refined.append(((start, end), [shift_segment(segment, start) for segment in region_result["segments"]]))
+            done += end - start
+            emit("progress", 70 + 20 * done / refined_seconds)
+
+        result = merge_refined_segments(draft_result["segments"], refined)
+        result["language"] = language
+        return result, refined_seconds
+
+    def transcribe(self, model, audio, model_name, device, precision, language, options, emit,
+                   checkpoint_key=None, timer=None, speculative=None, speculative_stats=None):
+        """Transcribe el audio ya preparado con el modo elegido en las opciones.
+
+        Con `checkpoint_key` se reanuda desde el último punto de control
+        compatible y se guardan puntos de control periódicamente. Los tiempos
+        de cada etapa se acumulan en `timer`. `speculative` (ver
+        `speculative_options`) activa la decodificación especulativa fuera del
+        modo largo y `speculative_stats` recibe los tokens propuestos y aceptados.
+        """
+        timer = timer or StageTimer()
+        checkpoint = self.checkpoints.load(checkpoint_key) if checkpoint_key else None
+        if checkpoint is not None and checkpoint.get("samples") != len(audio):
+            checkpoint = None
+
+        chunk_seconds = options["chunk_seconds"]
+        if options["parallel"] and len(audio) > chunk_seconds * SAMPLE_RATE:
+            completed = {}
+            if checkpoint is not None and checkpoint.get("mode") == "parallel":
+                completed = {int(index): segments for index, segments in checkpoint["chunks"].items()}
+                language = checkpoint["language"]
+                emit("status", f"⏯️ Reanudando: {len(completed)} fragmentos ya transcritos")
+
+            # Modo largo: todos los fragmentos comparten el idioma detectado una vez
+            if language is None:
+                with timer.stage("language_detection"):
+                    language, _ = detect_language(model, audio, precision)
+
+            def on_chunk_done(index, segments):
+                completed[index] = segments
+                if checkpoint_key:
+                    self.checkpoints.save(checkpoint_key, {
+                        "mode": "parallel", "samples": len(audio),
+                        "language": language, "chunks": completed,
+                    })
+
+            def on_chunk(done, total):
+                emit("status", f"🧩 Fragmentos transcritos: {done}/{total}")
+                emit("progress", 50 + 40 * done / total)
+
+            # Los procesos no comparten el medidor: se mide el conjunto de fragmentos
+            with timer.stage("parallel_chunks"):
+                return transcribe_parallel(audio, model_name, device, precision, language,
+                                           options["workers"], chunk_seconds, on_chunk,
+                                           completed, on_chunk_done, resolve_cpu_settings(options),
+                                           preset_decode_options(options["preset"]))
+
+        resume_state = None
+        if checkpoint is not None and checkpoint.get("mode") == "streaming":
+            resume_state = checkpoint["state"]
+            emit("status", f"⏯️ Reanudando desde {format_duration(resume_state['seek'] * HOP_LENGTH / SAMPLE_RATE)}")
+            emit("segments", resume_state["all_segments"])
+
+        started = time.monotonic()
+        resumed_seconds = None
+        last_checkpoint = time.monotonic()
+
+        def on_window(segments, transcriber):
+            nonlocal resumed_seconds, last_checkpoint
+            if checkpoint_key and time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL_SECONDS:
+                self.checkpoints.save(checkpoint_key, {
+                    "mode": "streaming", "samples": len(audio), "state": transcriber.state(),
+                })
+                last_checkpoint = time.monotonic()
+
+            emit("segments", segments)
+
+            done = transcriber.processed_seconds
+            total = transcriber.total_seconds
+            if resumed_seconds is None:
+                # Lo reanudado no cuenta para el RTF de esta ejecución
+                resumed_seconds = (resume_state["seek"] * HOP_LENGTH / SAMPLE_RATE) if resume_state else 0.0
+            elapsed = time.monotonic() - started
+            processed = done - resumed_seconds
+            rtf = elapsed / processed if processed > 0 else 0
+            eta = (total - done) * rtf
+            accepted = ""
+            if transcriber.speculative_proposed:
+                if speculative_stats is not None:
+                    speculative_stats.update(proposed=transcriber.speculative_proposed,
+                                             accepted=transcriber.speculative_accepted)
+                accepted = f" · aceptados {transcriber.speculative_accepted / transcriber.speculative_proposed:.0%}"
+            emit("status", f"🧠 Transcribiendo {format_duration(done)} / {format_duration(total)} · RTF {rtf:.2f} · ETA {format_duration(eta)}{accepted}")
+            emit("progress", 50 + 40 * done / total if total else 90)
+
+        # El modo largo con audio corto también decodifica ventana a ventana,
+        # como indican su clave de caché y sus métricas
+        encoder_batch = 1 if options["parallel"] else options["encoder_batch"]
+        return transcribe_streaming(model, audio, on_window, resume_state,
+                                    language=language, fp16=(precision == "fp16"), timer=timer,
+                                    encoder_batch=encoder_batch,
+                                    **preset_decode_options(options["preset"]), **(speculative or {}))
+
+# Estados de un trabajo de la cola
+JOB_PENDING = "pendiente"
+JOB_RUNNING = "procesando"
+JOB_DONE = "completado"
+JOB_FAILED = "error"
+
+class JobQueue:
+    """Cola de trabajos con un planificador que los ejecuta uno tras otro o N a la vez.
+
+    Cada trabajo es un diccionario con id, ruta, duración (obtenida con
+    ffprobe en segundo plano), estado, tiempo de proceso y resultado. Los
+    hilos del planificador toman el siguiente trabajo pendiente según la
+    política ("fifo" u "shortest") y llaman a `runner(job)`; `on_change(job)`
+    se llama cada vez que un trabajo cambia y `on_idle()` al vaciarse la cola.
+    Con `batch_runner` y `batch_size` > 1 los clips cortos pendientes se
+    toman juntos y `batch_runner(trabajos)` devuelve el resultado o la
+    excepción de cada uno.
+    """
+
+    def __init__(self, runner, on_change=None, on_idle=None, batch_runner=None):
+        self.runner = runner
+        self.batch_runner = batch_runner
+        self.on_change = on_change or (lambda job: None)
+        self.on_idle = on_idle or (lambda: None)
+        self.jobs = []
+        self.policy = "fifo"
+        self.batch_size = 0
+        self._next_id = 1
+        self._active_workers = 0
+        self._lock = threading.Lock()
+
+    def add(self, paths):
+        """Añade archivos a la cola y obtiene su duración en segundo plano"""
+        added = []
+        with self._lock:
+            for path in paths:
+                job = {
+                    "id": self._next_id,
+                    "path": path,
+                    "duration": None,
+                    "status": JOB_PENDING,
+                    "elapsed": None,
+                    "progress": 0,
+                    "status_text": "",
+                    "text": "",
+                    "result": None,
+                    "error": None,
+                    "timings": OrderedDict(),
+                }
+                self._next_id += 1
+                self.jobs.append(job)
+                added.append(job)
+
+        threading.Thread(target=self._probe, args=(added,), daemon=True).start()
+        return added
+
+    def _probe(self, jobs):
+        """Obtiene la duración de los trabajos añadidos"""
+        for job in jobs:
+            job["duration"] = probe_duration(job["path"])
+            self.on_change(job)
+
+    def get(self, job_id):
+        """Devuelve el trabajo con ese id (o None)"""
+        with self._lock:
+            return next((job for job in self.jobs if job["id"] == job_id), None)
+
+    def move(self, job_id, delta):
+        """Desplaza un trabajo `delta` posiciones en la cola"""
+        with self._lock:
+            index = next(i for i, job in enumerate(self.jobs) if job["id"] == job_id)
+            target = max(0, min(len(self.jobs) - 1, index + delta))
+            self.jobs.insert(target, self.jobs.pop(index))
+
+    def sort_shortest_first(self):
+        """Reordena los pendientes de menor a mayor duración"""
+        with self._lock:
+            pending = [job for job in self.jobs if job["status"] == JOB_PENDING]
+            others = [job for job in self.jobs if job["status"] != JOB_PENDING]
+            pending.sort(key=lambda job: float('inf') if job["duration"] is None else job["duration"])
+            self.jobs = others + pending
+
+    def remove(self, job_ids):
+        """Quita de la cola los trabajos indicados que no estén en proceso"""
+        with self._lock:
+            self.jobs = [job for job in self.jobs
+                         if job["id"] not in job_ids or job["status"] == JOB_RUNNING]
+
+    def clear_finished(self):
+        """Quita de la cola los trabajos terminados"""
+        with self._lock:
+            self.jobs = [job for job in self.jobs if job["status"] in (JOB_PENDING, JOB_RUNNING)]
+
+    def counts(self):
+        """Número de trabajos por estado"""
+        with self._lock:
+            counts = {JOB_PENDING: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+            for job in self.jobs:
+                counts[job["status"]] += 1
+            return counts
+
+    def is_running(self):
+        """Indica si hay hilos del planificador activos"""
+        with self._lock:
+            return self._active_workers > 0
+
+    def start(self, concurrency=1):
+        """Arranca hilos del planificador hasta `concurrency` trabajos simultáneos"""
+        with self._lock:
+            pending = sum(1 for job in self.jobs if job["status"] == JOB_PENDING)
+            new_workers = max(0, min(concurrency, pending) - self._active_workers)
+            self._active_workers += new_workers
+
+        for _ in range(new_workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+        return new_workers
+
+    @staticmethod
+    def is_short(job):
+        """Indica si un trabajo es un clip corto que puede ir en un lote"""
+        return job["duration"] is not None and job["duration"] <= SHORT_CLIP_SECONDS
+
+    def _take_next(self):
+        """Marca como en proceso y devuelve los siguientes trabajos según la política.
+
+        Devuelve una lista con un trabajo, o con varios clips cortos si el
+        modo por lotes está activo.
+        """
+        with self._lock:
+            pending = [job for job in self.jobs if job["status"] == JOB_PENDING]
+            if not pending:
+                self._active_workers -= 1
+                return [], self._active_workers == 0
+            if self.policy == "shortest":
+                pending.sort(key=lambda job: float('inf') if job["duration"] is None else job["duration"])
+            jobs = [pending[0]]
+            if self.batch_runner and self.batch_size > 1 and self.is_short(pending[0]):
+                jobs += [job for job in pending[1:] if self.is_short(job)][:self.batch_size - 1]
+            for job in jobs:
+                job["status"] = JOB_RUNNING
+            return jobs, False
+
+    def _worker(self):
+        """Bucle de un hilo del planificador"""
+        while True:
+            jobs, idle = self._take_next()
+            if not jobs:
+                if idle:
+                    self.on_idle()
+                return
+
+            for job in jobs:
+                self.on_change(job)
+            started = time.monotonic()
+            try:
+                outcomes = self.batch_runner(jobs) if len(jobs) > 1 else [self.runner(jobs[0])]
+            except Exception as e:
+                outcomes = [e] * len(jobs)
+            elapsed = time.monotonic() - started
+            for job, outcome in zip(jobs, outcomes):
+                if isinstance(outcome, Exception):
+                    job["error"] = str(outcome)
+                    job["status"] = JOB_FAILED
+                else:
+                    job["result"] = outcome
+                    job["status"] = JOB_DONE
+                job["elapsed"] = elapsed
+                self.on_change(job)
+
+# Modelos para detectar el idioma ("modelo elegido" = detección clásica con el modelo principal)
+LANGUAGE_MODEL_CHOICES = ("modelo elegido", "tiny", "base", "small")
+
+# Espera antes de precargar el modelo al abrir la ventana y tras cambiar el selector (ms)
+PRELOAD_STARTUP_DELAY_MS = 500
+PRELOAD_DEBOUNCE_MS = 400
 
 class VoiceExtractor:
     def __init__(self, root):
@@ -58,7 +3067,11 @@ class VoiceExtractor:
         self.text_queue = queue.Queue()
         self.metadata_info = {}
         self.current_progress = 0
-        self.whisper_model = None
+        self.model_cache = ModelCache()
+        self.pipeline = ExtractionPipeline(self.model_cache)
+        self.job_queue = JobQueue(self.run_job, self.on_job_change, self.on_queue_idle, self.run_job_batch)
+        self.job_options = dict(DEFAULT_OPTIONS)
+        self.displayed_job_id = None
         
         # Setup scrollable UI
         self.setup_scrollable_ui()
@@ -71,12 +3084,28 @@ class VoiceExtractor:
         
         # Mostrar splash mientras se cargan las dependencias pesadas
         self.show_loading_splash()
+        
+        # Importar torch/Whisper y precargar el modelo elegido cuando la ventana ya está visible
+        self.preload_after_id = None
+        self.model_var.trace_add("write", lambda *args: self.schedule_model_preload())
+        self.precision_var.trace_add("write", lambda *args: self.schedule_model_preload())
+        # RTF medido por preset: se lee de las métricas en segundo plano y tras cada trabajo
+        self.measured_rtf = {}
+        self.compute_device = None
+        # Información de los trabajos terminados cuyo texto final aún no se ha pintado
+        self.pending_metrics = {}
+        self.model_var.trace_add("write", lambda *args: self.update_preset_info())
+        self.preset_var.trace_add("write", lambda *args: self.update_preset_info())
+        self.precision_var.trace_add("write", lambda *args: self.update_preset_info())
+        self.update_preset_info()
+        threading.Thread(target=self.refresh_measured_rtf, daemon=True).start()
+        self.schedule_model_preload(PRELOAD_STARTUP_DELAY_MS)
     
     def show_loading_splash(self):
         """Muestra una pantalla de carga inicial"""
         self.loading_label = tk.Label(
             self.main_frame,
-            text="🚀 Voice Extractor cargado!\n\n💡 Los modelos de IA se cargarán al usarlos por primera vez",
+            text=f"🚀 Voice Extractor cargado!\n\n💡 Preparando el modelo '{self.model_var.get()}' en segundo plano",
             font=("Segoe UI", 12),
             bg='#1a1a1a',
             fg='#00ff88',
@@ -92,6 +3121,39 @@ class VoiceExtractor:
         if hasattr(self, 'loading_label'):
             self.loading_label.destroy()
     
+    def schedule_model_preload(self, delay_ms=PRELOAD_DEBOUNCE_MS):
+        """Programa la precarga del modelo elegido, agrupando cambios seguidos del selector"""
+        if self.preload_after_id is not None:
+            self.root.after_cancel(self.preload_after_id)
+        self.preload_after_id = self.root.after(delay_ms, self.preload_selected_model)
+
+    def preload_selected_model(self):
+        """Carga en segundo plano el modelo del selector si no hay trabajos en curso"""
+        self.preload_after_id = None
+        if self.is_processing:
+            # No competir por CPU y memoria con un trabajo; se reintenta al vaciarse la cola
+            return
+        self.model_cache.preload(self.model_var.get(), precision=self.precision_var.get(),
+                                 on_ready=self.on_model_preloaded)
+
+    def on_model_preloaded(self, name, error):
+        """Informa del resultado de la precarga (desde el hilo de fondo)"""
+        if not self.is_processing:
+            text = (f"✅ Modelo '{name}' listo" if error is None
+                    else f"⚠️ No se pudo precargar el modelo '{name}'; se cargará al extraer")
+            self.progress_queue.put(("status", text))
+
+    def update_preset_info(self):
+        """Muestra la descripción del preset elegido y su RTF medido con el modelo del selector"""
+        self.preset_info.config(text=preset_summary(self.preset_var.get(), self.model_var.get(), self.measured_rtf,
+                                                    self.compute_device, self.precision_var.get()))
+
+    def refresh_measured_rtf(self):
+        """Relee las métricas fuera del hilo de la interfaz y pide actualizar el preset"""
+        self.compute_device = get_compute_device()
+        self.measured_rtf = measured_preset_rtf()
+        self.progress_queue.put(("preset_info", None))
+
     def set_application_icon(self):
         """Configura el icono de la aplicación de manera robusta"""
         # Rutas del icono con prioridad (sin rutas absolutas específicas de PC)
@@ -148,6 +3210,13 @@ class VoiceExtractor:
             style.configure('Modern.TButton', background=button_color, foreground=fg_color, borderwidth=0, focuscolor='none')
             style.map('Modern.TButton', background=[('active', accent_color), ('pressed', '#00cc6a')])
             style.configure('Modern.TCombobox', background=button_color, foreground=fg_color, borderwidth=0)
+            style.configure('Modern.TCheckbutton', background=bg_color, foreground=fg_color, font=('Segoe UI', 10))
+            style.map('Modern.TCheckbutton', background=[('active', bg_color)])
+            style.configure('Modern.Treeview', background=button_color, fieldbackground=button_color,
+                            foreground=fg_color, borderwidth=0, font=('Segoe UI', 9))
+            style.configure('Modern.Treeview.Heading', background=bg_color, foreground=accent_color,
+                            font=('Segoe UI', 9, 'bold'))
+            style.map('Modern.Treeview', background=[('selected', '#00cc6a')])
             
         except Exception as e:
             print(f"⚠️ Error configurando estilos: {e}")
@@ -201,7 +3270,7 @@ class VoiceExtractor:
         file_frame = ttk.Frame(self.main_frame, style='Modern.TFrame')
         file_frame.pack(fill="x", pady=(0, 20))
         
-        ttk.Label(file_frame, text="📂 Archivo de Video/Audio:", style='Modern.TLabel').pack(anchor="w", pady=(0, 5))
+        ttk.Label(file_frame, text="📂 Cola de Archivos de Video/Audio:", style='Modern.TLabel').pack(anchor="w", pady=(0, 5))
         
         file_select_frame = ttk.Frame(file_frame, style='Modern.TFrame')
         file_select_frame.pack(fill="x")
@@ -212,6 +3281,48 @@ class VoiceExtractor:
         self.browse_button = ttk.Button(file_select_frame, text="📂 Browse Files", command=self.browse_file, style='Modern.TButton')
         self.browse_button.pack(side="right", padx=(10, 0))
         
+        # Lista de trabajos en cola
+        self.job_tree = ttk.Treeview(file_frame, columns=("file", "duration", "status", "elapsed"),
+                                     show="headings", height=6, style='Modern.Treeview')
+        self.job_tree.heading("file", text="Archivo")
+        self.job_tree.heading("duration", text="Duración")
+        self.job_tree.heading("status", text="Estado")
+        self.job_tree.heading("elapsed", text="Tiempo")
+        self.job_tree.column("file", width=420)
+        self.job_tree.column("duration", width=90, anchor="center")
+        self.job_tree.column("status", width=110, anchor="center")
+        self.job_tree.column("elapsed", width=90, anchor="center")
+        self.job_tree.pack(fill="x", pady=(10, 5))
+        self.job_tree.bind("<<TreeviewSelect>>", self.on_job_selected)
+        
+        queue_actions = ttk.Frame(file_frame, style='Modern.TFrame')
+        queue_actions.pack(fill="x")
+        
+        ttk.Button(queue_actions, text="⬆️", width=3, command=lambda: self.move_selected_job(-1), style='Modern.TButton').pack(side="left")
+        ttk.Button(queue_actions, text="⬇️", width=3, command=lambda: self.move_selected_job(1), style='Modern.TButton').pack(side="left", padx=(5, 0))
+        ttk.Button(queue_actions, text="⏱️ Más cortos primero", command=self.sort_jobs_shortest_first, style='Modern.TButton').pack(side="left", padx=(10, 0))
+        ttk.Button(queue_actions, text="➖ Quitar", command=self.remove_selected_jobs, style='Modern.TButton').pack(side="left", padx=(10, 0))
+        ttk.Button(queue_actions, text="🧹 Limpiar terminados", command=self.clear_finished_jobs, style='Modern.TButton').pack(side="left", padx=(10, 0))
+        
+        scheduler_frame = ttk.Frame(file_frame, style='Modern.TFrame')
+        scheduler_frame.pack(fill="x", pady=(5, 0))
+        
+        ttk.Label(scheduler_frame, text="Planificación:", style='Modern.TLabel').pack(side="left")
+        self.policy_var = tk.StringVar(value="Orden de la cola")
+        policy_combo = ttk.Combobox(scheduler_frame, textvariable=self.policy_var, values=[
+            "Orden de la cola", "Más cortos primero"
+        ], state="readonly", style='Modern.TCombobox', width=20)
+        policy_combo.pack(side="left", padx=(5, 15))
+        
+        ttk.Label(scheduler_frame, text="Trabajos simultáneos:", style='Modern.TLabel').pack(side="left")
+        self.concurrency_var = tk.IntVar(value=1)
+        ttk.Spinbox(scheduler_frame, from_=1, to=8, textvariable=self.concurrency_var, width=5).pack(side="left", padx=(5, 15))
+        
+        ttk.Label(scheduler_frame, text=f"Clips ≤{SHORT_CLIP_SECONDS}s por lote (0 = uno a uno):",
+                  style='Modern.TLabel').pack(side="left")
+        self.clip_batch_var = tk.IntVar(value=DEFAULT_CLIP_BATCH)
+        ttk.Spinbox(scheduler_frame, from_=0, to=64, textvariable=self.clip_batch_var, width=5).pack(side="left", padx=(5, 0))
+        
         # Frame para configuraciones
         config_frame = ttk.Frame(self.main_frame, style='Modern.TFrame')
         config_frame.pack(fill="x", pady=(0, 20))
@@ -234,6 +3345,40 @@ class VoiceExtractor:
                               style='Modern.TLabel', foreground='#888888', font=('Segoe UI', 8))
         model_info.pack(anchor="w", pady=(5, 0))
         
+        # Preset de decodificación (velocidad frente a precisión) con su RTF medido
+        preset_frame = ttk.Frame(model_frame, style='Modern.TFrame')
+        preset_frame.pack(anchor="w", pady=(5, 0))
+        
+        ttk.Label(preset_frame, text="🎛️ Preset:", style='Modern.TLabel').pack(side="left")
+        self.preset_var = tk.StringVar(value=DEFAULT_PRESET)
+        ttk.Combobox(preset_frame, textvariable=self.preset_var, values=list(DECODING_PRESETS),
+                     state="readonly", style='Modern.TCombobox', width=10).pack(side="left", padx=(10, 10))
+        self.preset_info = ttk.Label(preset_frame, text="", style='Modern.TLabel',
+                                     foreground='#888888', font=('Segoe UI', 8))
+        self.preset_info.pack(side="left")
+        
+        # Precisión de cálculo
+        precision_frame = ttk.Frame(model_frame, style='Modern.TFrame')
+        precision_frame.pack(anchor="w", pady=(5, 0))
+        
+        ttk.Label(precision_frame, text="🎚️ Precisión:", style='Modern.TLabel').pack(side="left")
+        self.precision_var = tk.StringVar(value=DEFAULT_OPTIONS["precision"])
+        ttk.Combobox(precision_frame, textvariable=self.precision_var, values=PRECISIONS,
+                     state="readonly", style='Modern.TCombobox', width=8).pack(side="left", padx=(10, 10))
+        ttk.Label(precision_frame, text="int8 = modelo cuantizado, más rápido y ligero en CPU",
+                  style='Modern.TLabel', foreground='#888888', font=('Segoe UI', 8)).pack(side="left")
+        
+        # Presupuesto de memoria de la caché de modelos
+        cache_frame = ttk.Frame(model_frame, style='Modern.TFrame')
+        cache_frame.pack(anchor="w", pady=(5, 0))
+        
+        ttk.Label(cache_frame, text="💾 Memoria para modelos en caché (MB):", style='Modern.TLabel').pack(side="left")
+        
+        self.cache_budget_var = tk.IntVar(value=self.model_cache.budget_mb)
+        cache_spin = ttk.Spinbox(cache_frame, from_=256, to=65536, increment=256,
+                                 textvariable=self.cache_budget_var, width=8)
+        cache_spin.pack(side="left", padx=(10, 0))
+        
         # Idioma
         lang_frame = ttk.Frame(config_frame, style='Modern.TFrame')
         lang_frame.pack(fill="x", pady=(0, 15))
@@ -246,6 +3391,152 @@ class VoiceExtractor:
         ], state="readonly", style='Modern.TCombobox', width=15)
         lang_combo.pack(anchor="w")
         
+        # Detección de idioma en dos etapas con un modelo pequeño
+        detect_frame = ttk.Frame(lang_frame, style='Modern.TFrame')
+        detect_frame.pack(anchor="w", pady=(5, 0))
+        
+        ttk.Label(detect_frame, text="Detectar idioma con:", style='Modern.TLabel').pack(side="left")
+        self.language_model_var = tk.StringVar(value=LANGUAGE_MODEL_CHOICES[0])
+        ttk.Combobox(detect_frame, textvariable=self.language_model_var, values=LANGUAGE_MODEL_CHOICES,
+                     state="readonly", style='Modern.TCombobox', width=15).pack(side="left", padx=(10, 10))
+        ttk.Label(detect_frame, text="tiny/base = rápido, con varias ventanas de todo el archivo",
+                  style='Modern.TLabel', foreground='#888888', font=('Segoe UI', 8)).pack(side="left")
+        
+        # Caché de resultados
+        self.result_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(config_frame, text="♻️ Reutilizar transcripciones en caché (mismo contenido y opciones)",
+                        variable=self.result_cache_var, style='Modern.TCheckbutton').pack(anchor="w", pady=(0, 10))
+        
+        # Caché de audio decodificado
+        self.audio_cache_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(config_frame, text="💽 Guardar el audio decodificado en disco para reintentos rápidos",
+                        variable=self.audio_cache_var, style='Modern.TCheckbutton').pack(anchor="w", pady=(0, 10))
+        
+        # Puntos de control
+        self.checkpoint_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(config_frame, text="⏯️ Guardar puntos de control y reanudar trabajos interrumpidos",
+                        variable=self.checkpoint_var, style='Modern.TCheckbutton').pack(anchor="w", pady=(0, 10))
+        
+        # Línea de tiempo para diagnóstico
+        self.trace_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(config_frame, text="🧭 Grabar línea de tiempo de cada trabajo (trace.json para chrome://tracing)",
+                        variable=self.trace_var, style='Modern.TCheckbutton').pack(anchor="w", pady=(0, 10))
+        
+        # Perfilado de los trabajos
+        profile_frame = ttk.Frame(config_frame, style='Modern.TFrame')
+        profile_frame.pack(anchor="w", pady=(0, 10))
+        
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(profile_frame, text="🔬 Perfilar trabajos con cProfile",
+                        variable=self.profile_var, style='Modern.TCheckbutton').pack(side="left")
+        
+        self.torch_profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(profile_frame, text="Incluir operadores de torch",
+                        variable=self.torch_profile_var, style='Modern.TCheckbutton').pack(side="left", padx=(15, 0))
+        
+        # Detección de voz
+        self.vad_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(config_frame, text="🔇 Omitir silencios (detección de voz antes de Whisper)",
+                        variable=self.vad_var, style='Modern.TCheckbutton').pack(anchor="w", pady=(0, 15))
+        
+        # Modo largo: transcripción paralela por fragmentos
+        long_frame = ttk.Frame(config_frame, style='Modern.TFrame')
+        long_frame.pack(fill="x", pady=(0, 15))
+        
+        self.parallel_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(long_frame, text="⚡ Modo largo: transcribir fragmentos en paralelo",
+                        variable=self.parallel_var, style='Modern.TCheckbutton').pack(anchor="w", pady=(0, 5))
+        
+        long_options = ttk.Frame(long_frame, style='Modern.TFrame')
+        long_options.pack(anchor="w")
+        
+        ttk.Label(long_options, text="Procesos:", style='Modern.TLabel').pack(side="left")
+        self.workers_var = tk.IntVar(value=default_worker_count())
+        ttk.Spinbox(long_options, from_=1, to=available_cpu_count(),
+                    textvariable=self.workers_var, width=5).pack(side="left", padx=(5, 15))
+        
+        ttk.Label(long_options, text="Duración de fragmento (min):", style='Modern.TLabel').pack(side="left")
+        self.chunk_minutes_var = tk.IntVar(value=DEFAULT_CHUNK_SECONDS // 60)
+        ttk.Spinbox(long_options, from_=1, to=120,
+                    textvariable=self.chunk_minutes_var, width=5).pack(side="left", padx=(5, 0))
+        
+        # Modo cascada: borrador rápido y modelo elegido solo en los segmentos dudosos
+        cascade_frame = ttk.Frame(config_frame, style='Modern.TFrame')
+        cascade_frame.pack(fill="x", pady=(0, 15))
+        
+        self.cascade_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(cascade_frame, text="🪜 Cascada: borrador rápido y el modelo elegido solo en segmentos dudosos",
+                        variable=self.cascade_var, style='Modern.TCheckbutton').pack(anchor="w", pady=(0, 5))
+        
+        cascade_options = ttk.Frame(cascade_frame, style='Modern.TFrame')
+        cascade_options.pack(anchor="w")
+        
+        ttk.Label(cascade_options, text="Borrador:", style='Modern.TLabel').pack(side="left")
+        self.draft_model_var = tk.StringVar(value=DEFAULT_DRAFT_MODEL)
+        ttk.Combobox(cascade_options, textvariable=self.draft_model_var, values=["tiny", "base", "small"],
+                     state="readonly", style='Modern.TCombobox', width=8).pack(side="left", padx=(5, 15))
+        
+        ttk.Label(cascade_options, text="Repasar si logprob <", style='Modern.TLabel').pack(side="left")
+        self.refine_logprob_var = tk.DoubleVar(value=CASCADE_LOGPROB_THRESHOLD)
+        ttk.Spinbox(cascade_options, from_=-3.0, to=0.0, increment=0.1,
+                    textvariable=self.refine_logprob_var, width=5).pack(side="left", padx=(5, 15))
+        
+        ttk.Label(cascade_options, text="compresión >", style='Modern.TLabel').pack(side="left")
+        self.refine_compression_var = tk.DoubleVar(value=CASCADE_COMPRESSION_THRESHOLD)
+        ttk.Spinbox(cascade_options, from_=1.0, to=5.0, increment=0.1,
+                    textvariable=self.refine_compression_var, width=5).pack(side="left", padx=(5, 15))
+        
+        ttk.Label(cascade_options, text="sin voz >", style='Modern.TLabel').pack(side="left")
+        self.refine_no_speech_var = tk.DoubleVar(value=CASCADE_NO_SPEECH_THRESHOLD)
+        ttk.Spinbox(cascade_options, from_=0.0, to=1.0, increment=0.05,
+                    textvariable=self.refine_no_speech_var, width=5).pack(side="left", padx=(5, 0))
+        
+        speculative_options = ttk.Frame(cascade_frame, style='Modern.TFrame')
+        speculative_options.pack(anchor="w", pady=(5, 0))
+        
+        self.speculative_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(speculative_options, text="⚡ Especulativa: el borrador propone tokens y el modelo elegido los verifica",
+                        variable=self.speculative_var, style='Modern.TCheckbutton').pack(side="left")
+        
+        ttk.Label(speculative_options, text="Tokens:", style='Modern.TLabel').pack(side="left", padx=(15, 0))
+        self.speculative_tokens_var = tk.IntVar(value=DEFAULT_SPECULATIVE_TOKENS)
+        ttk.Spinbox(speculative_options, from_=1, to=16,
+                    textvariable=self.speculative_tokens_var, width=5).pack(side="left", padx=(5, 0))
+        
+        # Hilos de CPU (0 = automático según los núcleos disponibles del contenedor o equipo)
+        threads_frame = ttk.Frame(config_frame, style='Modern.TFrame')
+        threads_frame.pack(fill="x", pady=(0, 15))
+        
+        ttk.Label(threads_frame, text=f"🧵 Hilos de CPU (0 = automático, {available_cpu_count()} núcleos disponibles):",
+                  style='Modern.TLabel').pack(anchor="w", pady=(0, 5))
+        
+        threads_options = ttk.Frame(threads_frame, style='Modern.TFrame')
+        threads_options.pack(anchor="w")
+        
+        ttk.Label(threads_options, text="torch:", style='Modern.TLabel').pack(side="left")
+        self.torch_threads_var = tk.IntVar(value=DEFAULT_TORCH_THREADS)
+        ttk.Spinbox(threads_options, from_=0, to=256,
+                    textvariable=self.torch_threads_var, width=5).pack(side="left", padx=(5, 15))
+        
+        ttk.Label(threads_options, text="inter-op:", style='Modern.TLabel').pack(side="left")
+        self.interop_threads_var = tk.IntVar(value=DEFAULT_INTEROP_THREADS)
+        ttk.Spinbox(threads_options, from_=0, to=64,
+                    textvariable=self.interop_threads_var, width=5).pack(side="left", padx=(5, 15))
+        
+        ttk.Label(threads_options, text="FFmpeg:", style='Modern.TLabel').pack(side="left")
+        self.ffmpeg_threads_var = tk.IntVar(value=DEFAULT_FFMPEG_THREADS)
+        ttk.Spinbox(threads_options, from_=0, to=64,
+                    textvariable=self.ffmpeg_threads_var, width=5).pack(side="left", padx=(5, 15))
+        
+        ttk.Label(threads_options, text="Núcleos del modo largo (ej. 0-7):", style='Modern.TLabel').pack(side="left")
+        self.cpu_affinity_var = tk.StringVar(value=DEFAULT_CPU_AFFINITY)
+        ttk.Entry(threads_options, textvariable=self.cpu_affinity_var, width=10).pack(side="left", padx=(5, 15))
+        
+        ttk.Label(threads_options, text="Ventanas por lote del codificador:", style='Modern.TLabel').pack(side="left")
+        self.encoder_batch_var = tk.IntVar(value=DEFAULT_ENCODER_BATCH)
+        ttk.Spinbox(threads_options, from_=1, to=32,
+                    textvariable=self.encoder_batch_var, width=5).pack(side="left", padx=(5, 0))
+        
         # Botón de extracción
         self.extract_button = ttk.Button(self.main_frame, text="🎯 Extract Voice", command=self.start_extraction, style='Modern.TButton')
         self.extract_button.pack(pady=20)
@@ -261,6 +3552,15 @@ class VoiceExtractor:
         self.progress_bar = ttk.Progressbar(self.progress_frame, length=400, mode='determinate')
         self.progress_bar.pack(fill="x")
         
+        # Panel plegable con el tiempo de cada etapa del trabajo mostrado
+        self.timings_button = ttk.Button(self.progress_frame, text="⏱️ Tiempos ▸", command=self.toggle_timings, style='Modern.TButton')
+        self.timings_button.pack(anchor="w", pady=(10, 0))
+        
+        self.timings_frame = ttk.Frame(self.progress_frame, style='Modern.TFrame')
+        self.timings_label = ttk.Label(self.timings_frame, text="", style='Modern.TLabel', justify="left")
+        self.timings_label.pack(anchor="w", pady=(5, 0))
+        self.timings_visible = False
+        
         # Área de texto extraído
         text_frame = ttk.Frame(self.main_frame, style='Modern.TFrame')
         text_frame.pack(fill="both", expand=True, pady=(0, 20))
@@ -310,26 +3610,148 @@ class VoiceExtractor:
             self.root.attributes('-alpha', 1.0)
 
     def browse_file(self):
-        """Abre el diálogo para seleccionar archivo"""
+        """Abre el diálogo para añadir archivos a la cola"""
         file_types = [
             ("Archivos de Video", "*.mp4 *.avi *.mov *.mkv *.wmv *.flv *.webm *.m4v"),
             ("Archivos de Audio", "*.mp3 *.wav *.aac *.ogg *.m4a *.flac"),
             ("Todos los archivos", "*.*")
         ]
         
-        filename = filedialog.askopenfilename(
-            title="Seleccionar archivo de video o audio",
+        filenames = filedialog.askopenfilenames(
+            title="Seleccionar archivos de video o audio",
             filetypes=file_types
         )
         
-        if filename:
-            self.video_file = filename
-            self.file_label.config(text=os.path.basename(filename), foreground='#00ff88')
+        if filenames:
+            for job in self.job_queue.add(list(filenames)):
+                self.job_tree.insert("", tk.END, iid=str(job["id"]), values=self.job_row(job))
+            self.update_queue_label()
             self.extract_button.config(state="normal")
+            
+            # Si ya se está procesando, los nuevos trabajos se incorporan a la ejecución
+            if self.is_processing:
+                self.job_queue.start(self.get_concurrency())
+
+    def job_row(self, job):
+        """Valores de la fila de un trabajo en la lista"""
+        duration = format_duration(job["duration"]) if job["duration"] is not None else "—"
+        elapsed = f"{job['elapsed']:.1f}s" if job["elapsed"] is not None else "—"
+        status = job["status"]
+        if job.get("cache_hit"):
+            status = f"{job['status']} ♻️"
+        elif job["status"] == JOB_RUNNING:
+            status = f"{job['status']} {job['progress']:.0f}%"
+        return (os.path.basename(job["path"]), duration, status, elapsed)
+
+    def refresh_job_tree(self):
+        """Redibuja la lista de trabajos respetando el orden de la cola"""
+        selected = self.job_tree.selection()
+        self.job_tree.delete(*self.job_tree.get_children())
+        for job in list(self.job_queue.jobs):
+            self.job_tree.insert("", tk.END, iid=str(job["id"]), values=self.job_row(job))
+        existing = [iid for iid in selected if self.job_tree.exists(iid)]
+        if existing:
+            self.job_tree.selection_set(existing)
+        self.update_queue_label()
+
+    def update_queue_label(self):
+        """Actualiza el resumen de la cola"""
+        counts = self.job_queue.counts()
+        total = sum(counts.values())
+        if total == 0:
+            self.file_label.config(text="Ningún archivo seleccionado", foreground='#888888')
+            return
+        self.file_label.config(
+            text=f"{total} archivos · {counts[JOB_PENDING]} pendientes · {counts[JOB_RUNNING]} en proceso · "
+                 f"{counts[JOB_DONE]} completados · {counts[JOB_FAILED]} con error",
+            foreground='#00ff88')
+
+    def selected_job_ids(self):
+        """Ids de los trabajos seleccionados en la lista"""
+        return [int(iid) for iid in self.job_tree.selection()]
+
+    def move_selected_job(self, delta):
+        """Sube o baja el trabajo seleccionado en la cola"""
+        for job_id in self.selected_job_ids()[:1]:
+            self.job_queue.move(job_id, delta)
+        self.refresh_job_tree()
+
+    def sort_jobs_shortest_first(self):
+        """Reordena los trabajos pendientes por duración"""
+        self.job_queue.sort_shortest_first()
+        self.refresh_job_tree()
+
+    def remove_selected_jobs(self):
+        """Quita de la cola los trabajos seleccionados"""
+        self.job_queue.remove(set(self.selected_job_ids()))
+        self.refresh_job_tree()
+
+    def clear_finished_jobs(self):
+        """Quita de la cola los trabajos terminados"""
+        self.job_queue.clear_finished()
+        self.refresh_job_tree()
+
+    def on_job_selected(self, event=None):
+        """Muestra el texto y el progreso del trabajo seleccionado"""
+        job_ids = self.selected_job_ids()
+        if job_ids:
+            self.display_job(job_ids[0])
+
+    def display_job(self, job_id):
+        """Muestra en el área de texto el contenido de un trabajo"""
+        job = self.job_queue.get(job_id)
+        if job is None:
+            return
+        
+        self.displayed_job_id = job_id
+        self.video_file = job["path"]
+        self.extracted_text = job["result"]["text"] if job["result"] else ""
+        self.text_area.delete(1.0, tk.END)
+        self.text_area.insert(1.0, self.extracted_text or job["text"])
+        if job.get("profile_summary"):
+            self.text_area.insert(tk.END, PROFILE_SEPARATOR + job["profile_summary"])
+        self.progress_bar['value'] = 100 if job["status"] == JOB_DONE else job["progress"]
+        if job["status_text"]:
+            self.progress_label.config(text=job["status_text"])
+        
+        state = "normal" if self.extracted_text else "disabled"
+        self.save_button.config(state=state)
+        self.copy_button.config(state=state)
+        self.clear_button.config(state=state)
+        self.update_timings()
+
+    def toggle_timings(self):
+        """Muestra u oculta el panel de tiempos por etapa"""
+        self.timings_visible = not self.timings_visible
+        if self.timings_visible:
+            self.timings_frame.pack(fill="x")
+            self.timings_button.config(text="⏱️ Tiempos ▾")
+            self.update_timings()
+        else:
+            self.timings_frame.pack_forget()
+            self.timings_button.config(text="⏱️ Tiempos ▸")
+
+    def update_timings(self):
+        """Actualiza el panel de tiempos con las etapas del trabajo mostrado"""
+        if not self.timings_visible:
+            return
+        job = self.job_queue.get(self.displayed_job_id) if self.displayed_job_id else None
+        if not job or not job["timings"]:
+            self.timings_label.config(text="Sin mediciones todavía")
+            return
+        lines = [f"{stage:<20} {seconds:8.2f}s" for stage, seconds in job["timings"].items()]
+        self.timings_label.config(text="\n".join(lines))
+
+    def get_concurrency(self):
+        """Número de trabajos simultáneos elegido"""
+        try:
+            return max(1, int(self.concurrency_var.get()))
+        except (tk.TclError, ValueError):
+            return 1
 
     def start_extraction(self):
-        """Inicia el proceso de extracción en un hilo separado"""
-        if not self.video_file:
+        """Inicia el planificador de la cola en hilos separados"""
+        if not self.job_queue.counts()[JOB_PENDING]:
             messagebox.showerror("Error", "Por favor selecciona un archivo primero")
             return
         
@@ -337,7 +3759,50 @@ class VoiceExtractor:
             messagebox.showwarning("Aviso", "Ya hay un proceso en curso")
             return
         
+        # El presupuesto se aplica en el hilo del trabajo: la caché no se bloquea desde la interfaz
+        try:
+            self.cache_budget_mb = int(self.cache_budget_var.get())
+        except (tk.TclError, ValueError):
+            self.cache_budget_mb = self.model_cache.budget_mb
+        
+        # Las opciones se leen aquí, en el hilo de la interfaz
+        self.job_options = {
+            "model": self.model_var.get(),
+            "preset": self.preset_var.get(),
+            "precision": self.precision_var.get(),
+            "language": self.language_var.get(),
+            "language_model": "" if self.language_model_var.get() == LANGUAGE_MODEL_CHOICES[0]
+                              else self.language_model_var.get(),
+            "vad": self.vad_var.get(),
+            "parallel": self.parallel_var.get(),
+            "workers": int(self.workers_var.get()),
+            "chunk_seconds": int(self.chunk_minutes_var.get()) * 60,
+            "result_cache": self.result_cache_var.get(),
+            "audio_cache": self.audio_cache_var.get(),
+            "checkpoint": self.checkpoint_var.get(),
+            "trace": self.trace_var.get(),
+            "profile": self.profile_var.get(),
+            "torch_profile": self.torch_profile_var.get(),
+            "cascade": self.cascade_var.get(),
+            "speculative": self.speculative_var.get(),
+            "speculative_tokens": int(self.speculative_tokens_var.get()),
+            "draft_model": self.draft_model_var.get(),
+            "refine_logprob": float(self.refine_logprob_var.get()),
+            "refine_compression_ratio": float(self.refine_compression_var.get()),
+            "refine_no_speech": float(self.refine_no_speech_var.get()),
+            "torch_threads": int(self.torch_threads_var.get()),
+            "interop_threads": int(self.interop_threads_var.get()),
+            "ffmpeg_threads": int(self.ffmpeg_threads_var.get()),
+            "cpu_affinity": self.cpu_affinity_var.get().strip(),
+            "encoder_batch": int(self.encoder_batch_var.get()),
+            "clip_batch": int(self.clip_batch_var.get()),
+        }
+        self.job_queue.policy = "shortest" if self.policy_var.get() == "Más cortos primero" else "fifo"
+        # Con opciones que el camino por lotes no aplica cada clip va por separado
+        self.job_queue.batch_size = self.job_options["clip_batch"] if clip_batching_applies(self.job_options) else 0
+        
         self.is_processing = True
+        self.displayed_job_id = None
         self.extract_button.config(text="⏸️ Procesando...", state="disabled")
         self.save_button.config(state="disabled")
         self.copy_button.config(state="disabled")
@@ -349,87 +3814,123 @@ class VoiceExtractor:
         while not self.progress_queue.empty():
             self.progress_queue.get()
         while not self.text_queue.empty():
-            self.text_queue.get()
+            kind, _, job_id = self.text_queue.get()
+            if kind == "final":
+                threading.Thread(target=self.record_job_metrics, args=(job_id, 0.0), daemon=True).start()
         
-        # Iniciar hilo de extracción
-        extraction_thread = threading.Thread(target=self.extract_voice_thread)
-        extraction_thread.daemon = True
-        extraction_thread.start()
+        # Iniciar los hilos del planificador
+        self.job_queue.start(self.get_concurrency())
+
+    def run_job(self, job):
+        """Ejecuta un trabajo de la cola (se llama desde un hilo del planificador)"""
+        self.model_cache.set_budget(self.cache_budget_mb)
+        return self.extract_voice_thread(job)
+
+    def run_job_batch(self, jobs):
+        """Ejecuta juntos varios clips cortos de la cola y devuelve el resultado o error de cada uno"""
+        self.model_cache.set_budget(self.cache_budget_mb)
+        outcomes = self.pipeline.run_batch([job["path"] for job in jobs], self.job_options,
+                                           [self.job_emitter(job) for job in jobs])
+        results = []
+        for job, outcome in zip(jobs, outcomes):
+            if isinstance(outcome, Exception):
+                self.progress_queue.put(("job_status", (job["id"], f"❌ Error: {str(outcome)}")))
+                results.append(outcome)
+            else:
+                results.append(self.finish_job(job, *outcome))
+        return results
 
-    def extract_voice_thread(self):
-        """Hilo principal de extracción de voz"""
+    def extract_voice_thread(self, job):
+        """Hilo principal de extracción de voz de un trabajo"""
+        tracer = TraceRecorder() if self.job_options.get("trace") else None
+
+        def run():
+            with (tracer.span("extract_voice_thread", "job", file=os.path.basename(job["path"]))
+                  if tracer else contextlib.nullcontext()):
+                return self.pipeline.run(job["path"], self.job_options, self.job_emitter(job), tracer)
+
+        profile_summary = None
         try:
-            self.progress_queue.put(("status", "🔄 Cargando modelo de IA..."))
-            self.progress_queue.put(("progress", 10))
-            
-            # Cargar Whisper de forma diferida
-            whisper = load_whisper()
-            if whisper is None:
-                raise Exception("No se pudo cargar el módulo Whisper")
-            
-            # Cargar el modelo de Whisper
-            model_name = self.model_var.get()
-            if self.whisper_model is None or getattr(self.whisper_model, 'name', '') != model_name:
-                self.whisper_model = whisper.load_model(model_name)
-            
-            self.progress_queue.put(("status", "🎬 Preparando archivo de audio..."))
-            self.progress_queue.put(("progress", 30))
-            
-            # Extraer audio si es video
-            audio_file = self.prepare_audio_file()
-            
-            self.progress_queue.put(("status", "🧠 Procesando con IA Whisper..."))
-            self.progress_queue.put(("progress", 50))
-            
-            # Transcribir
-            language = None if self.language_var.get() == "auto" else self.language_var.get()
-            result = self.whisper_model.transcribe(audio_file, language=language)
-            
-            self.progress_queue.put(("progress", 90))
-            
-            # Limpiar archivo temporal si se creó
-            if audio_file != self.video_file:
-                try:
-                    os.remove(audio_file)
-                except:
-                    pass
-            
-            # Enviar resultado
-            self.text_queue.put(result["text"])
-            self.progress_queue.put(("status", "✅ ¡Extracción completada!"))
-            self.progress_queue.put(("progress", 100))
-            self.progress_queue.put(("complete", True))
-            
+            if self.job_options.get("profile") or self.job_options.get("torch_profile"):
+                # Solo se perfila cuando se pide: sin coste en el resto de trabajos
+                base = diagnostics_base_for(job["path"], "profiles")
+                (result, info), profile_summary, paths = profile_call(
+                    run, base, self.job_options.get("torch_profile"))
+                profile_summary += "\n\n📁 " + "\n📁 ".join(paths)
+            else:
+                result, info = run()
         except Exception as e:
-            error_msg = f"❌ Error: {str(e)}"
-            self.progress_queue.put(("status", error_msg))
-            self.progress_queue.put(("error", str(e)))
-
-    def prepare_audio_file(self):
-        """Prepara el archivo de audio para el procesamiento"""
-        file_ext = os.path.splitext(self.video_file)[1].lower()
-        
-        # Si ya es un archivo de audio compatible, usarlo directamente
-        if file_ext in ['.wav', '.mp3', '.m4a', '.flac']:
-            return self.video_file
-        
-        # Convertir video a audio temporal
-        temp_audio = tempfile.mktemp(suffix='.wav')
-        
-        cmd = [
-            'ffmpeg', '-i', self.video_file,
-            '-vn', '-acodec', 'pcm_s16le',
-            '-ar', '16000', '-ac', '1',
-            '-y', temp_audio
-        ]
-        
+            self.save_job_trace(job, tracer)
+            self.progress_queue.put(("job_status", (job["id"], f"❌ Error: {str(e)}")))
+            raise
+        trace_path = self.save_job_trace(job, tracer)
+        return self.finish_job(job, result, info, trace_path, profile_summary)
+
+    def finish_job(self, job, result, info, trace_path=None, profile_summary=None):
+        """Envía el resultado de un trabajo terminado a la interfaz.
+
+        Las métricas se guardan cuando la interfaz pinta el texto final, para
+        incluir el tiempo real de pintado (ver `record_job_metrics`).
+        """
+        job["cache_hit"] = info["result_cached"]
+        self.pending_metrics[job["id"]] = info
+        status = f"✅ ¡Extracción completada! ({summary_text(info)})"
+        if trace_path:
+            status += f" · 🧭 Línea de tiempo: {trace_path}"
+        self.progress_queue.put(("job_status", (job["id"], status)))
+        self.progress_queue.put(("job_progress", (job["id"], 100)))
+        self.text_queue.put(("final", result["text"], job["id"]))
+        if profile_summary:
+            job["profile_summary"] = profile_summary
+            self.text_queue.put(("profile", profile_summary, job["id"]))
+        return result
+
+    def record_job_metrics(self, job_id, ui_render):
+        """Guarda las métricas de un trabajo con su tiempo de pintado (fuera del hilo de la interfaz)"""
+        info = self.pending_metrics.pop(job_id, None)
+        if info is None:
+            return
+        try:
+            append_job_metrics(info, extra_timings={"ui_render": ui_render})
+            self.refresh_measured_rtf()
+        except OSError as e:
+            print(f"No se pudieron guardar las métricas: {e}", file=sys.stderr)
+
+    def save_job_trace(self, job, tracer):
+        """Guarda la línea de tiempo de un trabajo y devuelve su ruta"""
+        if tracer is None:
+            return None
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            return temp_audio
-        except subprocess.CalledProcessError as e:
-            raise Exception(f"Error al convertir audio: {e.stderr}")
-        except FileNotFoundError:
-            raise Exception("FFmpeg no encontrado. Por favor instálalo.")
+            return tracer.save(diagnostics_base_for(job["path"], "traces") + ".trace.json")
+        except OSError as e:
+            print(f"No se pudo guardar la línea de tiempo: {e}")
+            return None
+
+    def job_emitter(self, job):
+        """Crea la función que traslada los eventos del pipeline a las colas de la interfaz"""
+        def emit(kind, data):
+            if kind == "segments":
+                # Enviar cada ventana a la interfaz en cuanto se decodifica
+                text = "".join(segment["text"] for segment in data)
+                if text:
+                    job["text"] += text
+                    self.text_queue.put(("append", text, job["id"]))
+            elif kind == "status":
+                self.progress_queue.put(("job_status", (job["id"], data)))
+            elif kind == "progress":
+                job["progress"] = data
+                self.progress_queue.put(("job_progress", (job["id"], data)))
+            elif kind == "stage":
+                self.progress_queue.put(("job_stage", (job["id"], data["stage"], data["total"])))
+        return emit
+
+    def on_job_change(self, job):
+        """Notifica a la interfaz que un trabajo cambió (desde cualquier hilo)"""
+        self.progress_queue.put(("job_update", job["id"]))
+
+    def on_queue_idle(self):
+        """Notifica a la interfaz que la cola terminó"""
+        self.progress_queue.put(("complete", True))
 
     def check_progress(self):
         """Verifica el progreso de la extracción"""
@@ -441,17 +3942,69 @@ class VoiceExtractor:
                     self.progress_label.config(text=msg_data)
                 elif msg_type == "progress":
                     self.progress_bar['value'] = msg_data
+                elif msg_type == "job_status":
+                    job_id, text = msg_data
+                    job = self.job_queue.get(job_id)
+                    if job is not None:
+                        job["status_text"] = text
+                    if self.follow_job(job_id):
+                        self.progress_label.config(text=text)
+                elif msg_type == "job_progress":
+                    job_id, value = msg_data
+                    if self.follow_job(job_id):
+                        self.progress_bar['value'] = value
+                    self.update_job_row(job_id)
+                elif msg_type == "job_stage":
+                    job_id, stage, total = msg_data
+                    job = self.job_queue.get(job_id)
+                    if job is not None:
+                        job["timings"][stage] = total
+                        if self.displayed_job_id == job_id:
+                            self.update_timings()
+                elif msg_type == "job_update":
+                    self.update_job_row(msg_data)
+                elif msg_type == "preset_info":
+                    self.update_preset_info()
                 elif msg_type == "complete":
                     self.extraction_complete()
-                elif msg_type == "error":
-                    self.extraction_error(msg_data)
             
             # Verificar texto extraído
             while not self.text_queue.empty():
-                text = self.text_queue.get_nowait()
-                self.extracted_text = text
-                self.text_area.delete(1.0, tk.END)
-                self.text_area.insert(1.0, text)
+                kind, text, job_id = self.text_queue.get_nowait()
+                if not self.follow_job(job_id):
+                    if kind == "final":
+                        # Trabajo no mostrado: sus métricas llevan solo lo pintado hasta ahora
+                        job = self.job_queue.get(job_id)
+                        render_time = job["timings"].get("ui_render", 0.0) if job is not None else 0.0
+                        threading.Thread(target=self.record_job_metrics, args=(job_id, render_time),
+                                         daemon=True).start()
+                    continue
+                render_started = time.monotonic()
+                if kind == "append":
+                    # Segmentos parciales mientras se transcribe
+                    self.text_area.insert(tk.END, text)
+                    self.text_area.see(tk.END)
+                elif kind == "profile":
+                    # El resumen del perfilado se muestra pero no forma parte del texto guardado
+                    self.text_area.insert(tk.END, PROFILE_SEPARATOR + text)
+                else:
+                    self.extracted_text = text
+                    self.text_area.delete(1.0, tk.END)
+                    self.text_area.insert(1.0, text)
+                    self.save_button.config(state="normal")
+                    self.copy_button.config(state="normal")
+                    self.clear_button.config(state="normal")
+                
+                # Tiempo de pintar el texto en la interfaz
+                render_time = time.monotonic() - render_started
+                job = self.job_queue.get(job_id)
+                if job is not None:
+                    render_time += job["timings"].get("ui_render", 0.0)
+                    job["timings"]["ui_render"] = render_time
+                    self.update_timings()
+                if kind == "final":
+                    # Con el texto final ya pintado se guardan las métricas del trabajo
+                    threading.Thread(target=self.record_job_metrics, args=(job_id, render_time), daemon=True).start()
                 
         except queue.Empty:
             pass
@@ -459,18 +4012,51 @@ class VoiceExtractor:
         # Programar siguiente verificación
         self.root.after(100, self.check_progress)
 
+    def follow_job(self, job_id):
+        """Indica si la interfaz muestra este trabajo, eligiéndolo si no se muestra ninguno activo"""
+        if self.displayed_job_id == job_id:
+            return True
+        
+        displayed = self.job_queue.get(self.displayed_job_id) if self.displayed_job_id else None
+        if displayed is None or displayed["status"] != JOB_RUNNING:
+            job = self.job_queue.get(job_id)
+            if job is not None and job["status"] == JOB_RUNNING:
+                self.display_job(job_id)
+                return True
+        return False
+
+    def update_job_row(self, job_id):
+        """Actualiza la fila de un trabajo en la lista"""
+        job = self.job_queue.get(job_id)
+        if job is not None and self.job_tree.exists(str(job_id)):
+            self.job_tree.item(str(job_id), values=self.job_row(job))
+        self.update_queue_label()
+
     def extraction_complete(self):
-        """Maneja la finalización exitosa de la extracción"""
+        """Maneja la finalización de toda la cola"""
+        if self.job_queue.is_running():
+            # Se añadieron trabajos después de que el planificador quedara libre
+            return
+        
         self.is_processing = False
         self.extract_button.config(text="🎯 Extract Voice", state="normal")
-        self.save_button.config(state="normal")
-        self.copy_button.config(state="normal")
-        self.clear_button.config(state="normal")
+        self.refresh_job_tree()
+        
+        # Dejar listo el modelo del selector para la próxima extracción
+        self.schedule_model_preload()
+        
+        failed = [job for job in self.job_queue.jobs if job["status"] == JOB_FAILED and not job.get("reported")]
+        if self.extracted_text:
+            self.save_button.config(state="normal")
+            self.copy_button.config(state="normal")
+            self.clear_button.config(state="normal")
+        if failed:
+            self.extraction_error("\n".join(f"{os.path.basename(job['path'])}: {job['error']}" for job in failed))
+            for job in failed:
+                job["reported"] = True
 
     def extraction_error(self, error_msg):
         """Maneja errores durante la extracción"""
-        self.is_processing = False
-        self.extract_button.config(text="🎯 Extract Voice", state="normal")
         messagebox.showerror("Error de Extracción", f"Error durante la extracción:\n\n{error_msg}")
 
     def save_text(self):
@@ -524,11 +4110,600 @@ class VoiceExtractor:
         self.progress_label.config(text="Listo para procesar")
         self.progress_bar['value'] = 0
 
+# Extensiones que se buscan al recibir directorios en la línea de comandos
+MEDIA_EXTENSIONS = {
+    '.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v',
+    '.mp3', '.wav', '.aac', '.ogg', '.m4a', '.flac',
+}
+
+def collect_input_files(patterns):
+    """Expande rutas, comodines y directorios en una lista de archivos multimedia"""
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        for match in matches:
+            if os.path.isdir(match):
+                for folder, _, names in sorted(os.walk(match)):
+                    for name in sorted(names):
+                        if os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS:
+                            files.append(os.path.join(folder, name))
+            else:
+                files.append(match)
+
+    # Eliminar duplicados conservando el orden
+    return list(dict.fromkeys(os.path.abspath(path) for path in files))
+
+def output_path_for(path, output_dir, extension):
+    """Ruta de salida de la transcripción de un archivo"""
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    folder = output_dir or os.path.dirname(path)
+    return os.path.join(folder, f"{base_name}_transcription{extension}")
+
+def write_transcription(result, path, output_format):
+    """Guarda el resultado como texto plano o JSON con segmentos"""
+    with open(path, 'w', encoding='utf-8') as f:
+        if output_format == "json":
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        else:
+            f.write(result["text"])
+
+# Evita que se mezclen líneas JSONL emitidas desde varios hilos
+_emit_lock = threading.Lock()
+
+def emit_json(event, **data):
+    """Escribe un evento de progreso JSONL en la salida estándar"""
+    line = json.dumps({"event": event, **data}, ensure_ascii=False)
+    with _emit_lock:
+        print(line, flush=True)
+
+def build_arg_parser():
+    """Construye el analizador de argumentos de la línea de comandos"""
+    parser = argparse.ArgumentParser(
+        prog="Voice_extractor.py",
+        description="Voice Extractor - transcripción con Whisper (sin argumentos abre la interfaz gráfica)")
+    commands = parser.add_subparsers(dest="command")
+
+    transcribe = commands.add_parser("transcribe", help="Transcribe archivos sin interfaz gráfica")
+    transcribe.add_argument("inputs", nargs="+", help="Archivos, comodines o directorios")
+    transcribe.add_argument("--model", default=DEFAULT_OPTIONS["model"],
+                            help="Modelo de Whisper (tiny, base, small, medium, large)")
+    transcribe.add_argument("--preset", choices=list(DECODING_PRESETS), default=DEFAULT_PRESET,
+                            help="Decodificación: fastest (voraz), balanced (Whisper por defecto) o accurate (haz de 5)")
+    transcribe.add_argument("--lang", "--language", dest="language", default=DEFAULT_OPTIONS["language"],
+                            help="Código de idioma o 'auto'")
+    transcribe.add_argument("--detect-model", default=DEFAULT_OPTIONS["language_model"],
+                            help="Con --lang auto, modelo pequeño (tiny, base) que decide el idioma antes de transcribir")
+    transcribe.add_argument("--language-samples", type=int, default=DEFAULT_LANGUAGE_SAMPLES,
+                            help="Ventanas de 30 s repartidas por el archivo para detectar el idioma")
+    transcribe.add_argument("--precision", choices=PRECISIONS, default=DEFAULT_OPTIONS["precision"],
+                            help="Precisión de cálculo (int8 = modelo cuantizado en CPU)")
+    transcribe.add_argument("--output-dir", "-o", default=None,
+                            help="Directorio de salida (por defecto, junto a cada archivo)")
+    transcribe.add_argument("--format", choices=["txt", "json"], default="txt",
+                            help="Formato de salida: texto o JSON con segmentos")
+    transcribe.add_argument("--vad", action="store_true", help="Omitir silencios antes de Whisper")
+    transcribe.add_argument("--parallel", action="store_true",
+                            help="Modo largo: transcribir fragmentos en paralelo")
+    transcribe.add_argument("--workers", type=int, default=DEFAULT_OPTIONS["workers"],
+                            help="Procesos del modo largo")
+    transcribe.add_argument("--chunk-minutes", type=int, default=DEFAULT_CHUNK_SECONDS // 60,
+                            help="Duración de fragmento del modo largo (minutos)")
+    transcribe.add_argument("--encoder-batch", type=int, default=DEFAULT_ENCODER_BATCH,
+                            help="Ventanas de 30 s que el codificador procesa a la vez (rejilla fija si es > 1; "
+                                 "VOICE_EXTRACTOR_ENCODER_BATCH)")
+    transcribe.add_argument("--batch-clips", dest="clip_batch", type=int, default=DEFAULT_CLIP_BATCH,
+                            help=f"Transcribir juntos hasta N clips de {SHORT_CLIP_SECONDS} s o menos "
+                                 "(0 = uno a uno; VOICE_EXTRACTOR_CLIP_BATCH)")
+    transcribe.add_argument("--cascade", action="store_true",
+                            help="Borrador con --draft-model y el modelo elegido solo en los segmentos dudosos")
+    transcribe.add_argument("--speculative", action="store_true",
+                            help="Decodificación especulativa: --draft-model propone tokens y el modelo elegido los verifica")
+    transcribe.add_argument("--speculative-tokens", type=int, default=DEFAULT_SPECULATIVE_TOKENS,
+                            help="Tokens que propone el borrador en cada paso de la decodificación especulativa")
+    transcribe.add_argument("--draft-model", default=DEFAULT_DRAFT_MODEL,
+                            help="Modelo rápido del borrador (modo cascada y decodificación especulativa)")
+    transcribe.add_argument("--refine-logprob", type=float, default=CASCADE_LOGPROB_THRESHOLD,
+                            help="Repasar los segmentos con avg_logprob menor que este valor")
+    transcribe.add_argument("--refine-compression", type=float, default=CASCADE_COMPRESSION_THRESHOLD,
+                            help="Repasar los segmentos con compression_ratio mayor que este valor")
+    transcribe.add_argument("--refine-no-speech", type=float, default=CASCADE_NO_SPEECH_THRESHOLD,
+                            help="Repasar los segmentos con no_speech_prob mayor que este valor")
+    transcribe.add_argument("--torch-threads", type=int, default=DEFAULT_TORCH_THREADS,
+                            help="Hilos de torch (0 = según la cuota de CPU; VOICE_EXTRACTOR_TORCH_THREADS)")
+    transcribe.add_argument("--interop-threads", type=int, default=DEFAULT_INTEROP_THREADS,
+                            help="Hilos inter-op de torch (0 = automático; VOICE_EXTRACTOR_INTEROP_THREADS)")
+    transcribe.add_argument("--ffmpeg-threads", type=int, default=DEFAULT_FFMPEG_THREADS,
+                            help="Hilos de FFmpeg (0 = automático; VOICE_EXTRACTOR_FFMPEG_THREADS)")
+    transcribe.add_argument("--cpu-affinity", default=DEFAULT_CPU_AFFINITY,
+                            help="Núcleos permitidos, p. ej. 0-7 (se reparten entre los procesos del modo largo; "
+                                 "VOICE_EXTRACTOR_CPU_AFFINITY)")
+    transcribe.add_argument("--cache-mb", type=int, default=DEFAULT_MODEL_CACHE_MB,
+                            help="Memoria máxima para modelos en caché (MB)")
+    transcribe.add_argument("--verify-models", action="store_true", default=DEFAULT_VERIFY_CHECKPOINTS,
+                            help="Verificar el SHA-256 completo del checkpoint en cada carga "
+                                 "(VOICE_EXTRACTOR_VERIFY_MODELS=1)")
+    transcribe.add_argument("--no-result-cache", action="store_true",
+                            help="No reutilizar ni guardar transcripciones en la caché de resultados")
+    transcribe.add_argument("--no-checkpoint", action="store_true",
+                            help="No guardar puntos de control ni reanudar trabajos interrumpidos")
+    transcribe.add_argument("--audio-cache", action="store_true",
+                            help="Guardar y reutilizar el audio decodificado (.npy mapeado en memoria)")
+    transcribe.add_argument("--audio-cache-mb", type=int, default=DEFAULT_AUDIO_CACHE_MB,
+                            help="Cuota de disco de la caché de audio decodificado (MB)")
+    transcribe.add_argument("--result-cache-mb", type=int, default=DEFAULT_RESULT_CACHE_MB,
+                            help="Tamaño máximo de la caché de resultados en disco (MB)")
+    transcribe.add_argument("--metrics", default=None,
+                            help="Archivo JSONL de métricas por trabajo (por defecto en la caché)")
+    transcribe.add_argument("--profile", action="store_true",
+                            help="Perfilar cada archivo con cProfile (.prof y resumen junto a la salida)")
+    transcribe.add_argument("--torch-profile", action="store_true",
+                            help="Perfilar además los operadores de torch en CPU (implica --profile)")
+    transcribe.add_argument("--trace", action="store_true",
+                            help="Guardar la línea de tiempo de cada archivo (<nombre>_transcription.trace.json)")
+
+    benchmark = commands.add_parser("benchmark", help="Mide el rendimiento por modelo, hilos y precisión")
+    benchmark.add_argument("--models", nargs="+", default=["tiny", "base", "small", "medium", "large"],
+                           help="Modelos a medir")
+    benchmark.add_argument("--threads", nargs="+", type=int, default=[available_cpu_count()],
+                           help="Números de hilos de torch a medir")
+    benchmark.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=["auto"],
+                           help="Precisiones a medir; con fp32 las demás se comparan contra ella")
+    benchmark.add_argument("--encoder-batch", nargs="+", type=int, default=[1],
+                           help="Ventanas por lote del codificador a medir")
+    benchmark.add_argument("--speculative", action="store_true",
+                           help="Medir cada configuración también con decodificación especulativa")
+    benchmark.add_argument("--draft-model", default=DEFAULT_DRAFT_MODEL,
+                           help="Modelo borrador de la decodificación especulativa")
+    benchmark.add_argument("--speculative-tokens", type=int, default=DEFAULT_SPECULATIVE_TOKENS,
+                           help="Tokens que propone el borrador en cada paso")
+    benchmark.add_argument("--audio", nargs="*", default=[],
+                           help="Clips de referencia adicionales (archivos, comodines o directorios)")
+    benchmark.add_argument("--duration", type=int, default=60,
+                           help="Duración del audio sintético de referencia (segundos)")
+    benchmark.add_argument("--no-synthetic", action="store_true", help="No usar el audio sintético")
+    benchmark.add_argument("--lang", "--language", dest="language", default="en",
+                           help="Idioma fijo para que todas las ejecuciones sean comparables")
+    benchmark.add_argument("--output", "-o", default=f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json",
+                           help="Archivo de resultados (.json o .csv)")
+
+    convert = commands.add_parser("convert", help="Convierte modelos al formato mapeado en memoria (una sola vez)")
+    convert.add_argument("--models", nargs="+", default=[DEFAULT_OPTIONS["model"]],
+                         help="Modelos a convertir")
+    convert.add_argument("--no-verify", action="store_true",
+                         help="No comparar el archivo convertido con los pesos originales")
+    return parser
+
+def run_cli(args):
+    """Transcribe archivos en lote emitiendo progreso JSONL; devuelve el código de salida"""
+    files = collect_input_files(args.inputs)
+    if not files:
+        emit_json("error", message="No se encontraron archivos de entrada")
+        return 2
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    # Una sola caché: el modelo queda cargado para todos los archivos
+    pipeline = ExtractionPipeline(ModelCache(args.cache_mb, args.verify_models),
+                                  ResultCache(budget_mb=args.result_cache_mb),
+                                  AudioCache(budget_mb=args.audio_cache_mb))
+    options = {
+        "model": args.model,
+        "preset": args.preset,
+        "precision": args.precision,
+        "language": args.language,
+        "language_model": args.detect_model,
+        "language_samples": args.language_samples,
+        "vad": args.vad,
+        "parallel": args.parallel,
+        "workers": args.workers,
+        "chunk_seconds": args.chunk_minutes * 60,
+        "encoder_batch": args.encoder_batch,
+        "result_cache": not args.no_result_cache,
+        "audio_cache": args.audio_cache,
+        "checkpoint": not args.no_checkpoint,
+        "cascade": args.cascade,
+        "speculative": args.speculative,
+        "speculative_tokens": args.speculative_tokens,
+        "draft_model": args.draft_model,
+        "refine_logprob": args.refine_logprob,
+        "refine_compression_ratio": args.refine_compression,
+        "refine_no_speech": args.refine_no_speech,
+        "torch_threads": args.torch_threads,
+        "interop_threads": args.interop_threads,
+        "ffmpeg_threads": args.ffmpeg_threads,
+        "cpu_affinity": args.cpu_affinity,
+        "clip_batch": args.clip_batch,
+    }
+
+    # Fijar los núcleos antes de cargar torch para que todos sus hilos los hereden
+    try:
+        set_cpu_affinity(resolve_cpu_settings(options)["cpus"])
+    except Exception as e:
+        emit_json("error", message=str(e))
+        return 2
+
+    # RTF de ejecuciones anteriores con el mismo preset y modelo
+    device = get_compute_device()
+    precision = resolve_precision(args.precision, device)
+    rtf, runs = measured_preset_rtf(args.metrics).get((args.preset, args.model, device, precision), (None, 0))
+    emit_json("preset", name=args.preset, model=args.model, device=device, precision=precision,
+              description=PRESET_DESCRIPTIONS[args.preset], measured_rtf=rtf and round(rtf, 4), runs=runs)
+
+    def make_emit(path):
+        def emit(kind, data):
+            if kind == "segments":
+                emit_json("segments", file=path, segments=[
+                    {"start": s["start"], "end": s["end"], "text": s["text"]} for s in data
+                ])
+            elif kind == "progress":
+                emit_json("progress", file=path, percent=round(data, 1))
+            elif kind == "stage":
+                emit_json("stage", file=path, stage=data["stage"],
+                          seconds=round(data["seconds"], 4), total=round(data["total"], 4))
+            else:
+                emit_json(kind, file=path, message=data)
+        return emit
+
+    def finish(path, result, info):
+        extension = ".json" if args.format == "json" else ".txt"
+        output = output_path_for(path, args.output_dir, extension)
+        write_transcription(result, output, args.format)
+        append_job_metrics(info, args.metrics)
+        emit_json("done", file=path, output=output, language=info["language"],
+                  language_probability=info.get("language_probability"),
+                  refined_fraction=info.get("refined_fraction"), accepted_token_rate=info.get("accepted_token_rate"),
+                  cache_hit=info["result_cached"], timings=info["timings"],
+                  audio_seconds=info["audio_seconds"] and round(info["audio_seconds"], 2),
+                  rtf=info.get("transcribe_time") and info["audio_seconds"]
+                      and round(info["transcribe_time"] / info["audio_seconds"], 4),
+                  encoder_batch=info.get("encoder_batch"), clip_batch=info.get("clip_batch"),
+                  peak_rss_mb=info.get("peak_rss_mb") and round(info["peak_rss_mb"], 1),
+                  elapsed=round(info["elapsed"], 2))
+
+    # Micro-lotes: los clips cortos se agrupan y el resto se transcribe uno a uno
+    batches = []
+    single = list(enumerate(files, start=1))
+    if clip_batching_applies(dict(options, trace=args.trace, profile=args.profile, torch_profile=args.torch_profile)):
+        with ThreadPoolExecutor(max_workers=available_cpu_count()) as pool:
+            durations = list(pool.map(probe_duration, files))
+        short = [(index, path) for (index, path), duration in zip(single, durations)
+                 if duration is not None and duration <= SHORT_CLIP_SECONDS]
+        single = [item for item in single if item not in short]
+        batches = [short[i:i + args.clip_batch] for i in range(0, len(short), args.clip_batch)]
+
+    failures = 0
+    for batch in batches:
+        for index, path in batch:
+            emit_json("start", file=path, index=index, total=len(files))
+        paths = [path for _, path in batch]
+        outcomes = pipeline.run_batch(paths, options, [make_emit(path) for path in paths])
+        for path, outcome in zip(paths, outcomes):
+            try:
+                if isinstance(outcome, Exception):
+                    raise outcome
+                finish(path, *outcome)
+            except Exception as e:
+                failures += 1
+                emit_json("error", file=path, message=str(e))
+
+    for index, path in single:
+        emit_json("start", file=path, index=index, total=len(files))
+        emit = make_emit(path)
+        tracer = TraceRecorder() if args.trace else None
+        try:
+            try:
+                if args.profile or args.torch_profile:
+                    base = output_path_for(path, args.output_dir, "")
+                    (result, info), summary, paths = profile_call(
+                        lambda: pipeline.run(path, options, emit, tracer), base, args.torch_profile)
+                    emit_json("profile", file=path, outputs=paths, summary=summary)
+                else:
+                    result, info = pipeline.run(path, options, emit, tracer)
+            finally:
+                if tracer:
+                    trace_path = tracer.save(output_path_for(path, args.output_dir, ".trace.json"))
+                    emit_json("trace", file=path, output=trace_path)
+            finish(path, result, info)
+        except Exception as e:
+            failures += 1
+            emit_json("error", file=path, message=str(e))
+
+    emit_json("finished", files=len(files), failures=failures)
+    return 1 if failures else 0
+
+def synthetic_speech(seconds, sample_rate=SAMPLE_RATE, seed=0):
+    """Genera audio de referencia determinista con aspecto de voz.
+
+    Sílabas armónicas de 120-240 Hz con envolvente, pausas entre frases,
+    un tono puro y ruido de fondo. Siempre produce la misma señal para una
+    semilla, de modo que los resultados son comparables entre máquinas.
+    """
+    rng = np.random.RandomState(seed)
+    audio = np.zeros(int(seconds * sample_rate), dtype=np.float32)
+    position = 0
+    while position < len(audio):
+        # Frase de 4-12 sílabas seguida de una pausa
+        for _ in range(rng.randint(4, 13)):
+            length = int(rng.uniform(0.12, 0.3) * sample_rate)
+            t = np.arange(length) / sample_rate
+            f0 = rng.uniform(120, 240)
+            syllable = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+            syllable *= np.hanning(length)
+            end = min(len(audio), position + length)
+            audio[position:end] += 0.2 * syllable[:end - position]
+            position += length + int(rng.uniform(0.02, 0.08) * sample_rate)
+        position += int(rng.uniform(0.3, 1.0) * sample_rate)
+
+    # Tono puro de 1 s en el centro
+    middle = len(audio) // 2
+    t = np.arange(min(sample_rate, len(audio) - middle)) / sample_rate
+    audio[middle:middle + len(t)] = 0.3 * np.sin(2 * np.pi * 440 * t)
+
+    audio += 0.003 * rng.randn(len(audio)).astype(np.float32)
+    return np.clip(audio, -1.0, 1.0)
+
+def write_wav(path, audio, sample_rate=SAMPLE_RATE):
+    """Guarda audio float32 como WAV PCM de 16 bits"""
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((np.clip(audio, -1.0, 1.0) * 32767).astype('<i2').tobytes())
+
+def peak_rss_mb():
+    """Memoria residente máxima del proceso actual (MB)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa en KB y macOS en bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / (1024 * 1024)
+    except (AttributeError, OSError):
+        return None
+
+def _run_benchmark_case(case):
+    """Ejecuta una configuración del benchmark en un proceso nuevo y devuelve sus métricas"""
+    torch = load_torch()
+    # Misma semilla en todas las ejecuciones para que el muestreo de respaldo sea comparable
+    torch.manual_seed(0)
+
+    # Cachés vacías para medir carga, decodificación e inferencia completas
+    scratch = get_cache_dir("benchmark", f"run_{os.getpid()}")
+    try:
+        pipeline = ExtractionPipeline(ModelCache(), ResultCache(os.path.join(scratch, "results")),
+                                      AudioCache(os.path.join(scratch, "audio")),
+                                      CheckpointStore(os.path.join(scratch, "checkpoints")))
+        options = dict(case["options"], model=case["model"], precision=case["precision"],
+                       torch_threads=case["threads"], result_cache=False, audio_cache=False, checkpoint=False)
+        result, info = pipeline.run(case["audio"], options, lambda kind, data: None)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    words = len(result["text"].split())
+    transcribe_time = info.get("transcribe_time", 0.0)
+    return {
+        "model": case["model"],
+        "threads": case["threads"],
+        "precision": info["precision"],
+        "encoder_batch": info["encoder_batch"],
+        # Pedida en la configuración frente a realmente usada (el borrador puede ser incompatible)
+        "speculative_requested": case["options"].get("speculative", False),
+        "speculative": info.get("speculative", False),
+        "accepted_token_rate": info.get("accepted_token_rate") and round(info["accepted_token_rate"], 4),
+        "device": info["device"],
+        "audio": os.path.basename(case["audio"]),
+        "audio_seconds": round(info["audio_seconds"], 2),
+        "load_time": round(info["load_time"], 3),
+        "decode_time": round(info["decode_time"], 3),
+        "transcribe_time": round(transcribe_time, 3),
+        "rtf": round(transcribe_time / info["audio_seconds"], 4) if info["audio_seconds"] else None,
+        "peak_rss_mb": round(peak_rss_mb() or 0, 1),
+        "words": words,
+        "words_per_sec": round(words / transcribe_time, 2) if transcribe_time else None,
+        "language": info["language"],
+        "text": result["text"],
+    }
+
+def word_error_rate(reference, hypothesis):
+    """Tasa de error por palabras (WER) de `hypothesis` respecto a `reference`"""
+    reference = re.findall(r"\w+", reference.lower())
+    hypothesis = re.findall(r"\w+", hypothesis.lower())
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    # Distancia de edición por palabras, fila a fila
+    previous = list(range(len(hypothesis) + 1))
+    for i, word in enumerate(reference, start=1):
+        current = [i]
+        for j, other in enumerate(hypothesis, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != other)))
+        previous = current
+    return previous[-1] / len(reference)
+
+def compare_with_fp32(rows, texts):
+    """Añade a cada fila la aceleración y el WER frente a la ejecución fp32 equivalente"""
+    baselines = {(row["model"], row["threads"], row["audio"], row["encoder_batch"],
+                  row["speculative_requested"]): index
+                 for index, row in enumerate(rows) if row["precision"] == "fp32"}
+    for index, (row, text) in enumerate(zip(rows, texts)):
+        row["speedup_vs_fp32"] = None
+        row["wer_vs_fp32"] = None
+        baseline = baselines.get((row["model"], row["threads"], row["audio"], row["encoder_batch"],
+                                  row["speculative_requested"]))
+        if baseline is None or baseline == index:
+            continue
+        if row["transcribe_time"]:
+            row["speedup_vs_fp32"] = round(rows[baseline]["transcribe_time"] / row["transcribe_time"], 3)
+        row["wer_vs_fp32"] = round(word_error_rate(texts[baseline], text), 4)
+    return rows
+
+def compare_with_greedy(rows, texts):
+    """Añade a cada fila especulativa la aceleración frente a la voraz y si el texto coincide.
+
+    Solo cuentan las filas que usaron de verdad el borrador; las que lo
+    pidieron pero decodificaron de forma voraz no se comparan.
+    """
+    baselines = {(row["model"], row["threads"], row["precision"], row["audio"], row["encoder_batch"]): index
+                 for index, row in enumerate(rows) if not row["speculative_requested"]}
+    for row, text in zip(rows, texts):
+        row["speedup_vs_greedy"] = None
+        row["matches_greedy"] = None
+        baseline = baselines.get((row["model"], row["threads"], row["precision"], row["audio"],
+                                  row["encoder_batch"]))
+        if not row["speculative"] or baseline is None:
+            continue
+        if row["transcribe_time"]:
+            row["speedup_vs_greedy"] = round(rows[baseline]["transcribe_time"] / row["transcribe_time"], 3)
+        row["matches_greedy"] = text == texts[baseline]
+    return rows
+
+def machine_info():
+    """Datos de la máquina y de las versiones para comparar benchmarks"""
+    torch = load_torch()
+    whisper = load_whisper()
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "available_cpus": available_cpu_count(),
+        "python": platform.python_version(),
+        "torch": getattr(torch, "__version__", None),
+        "whisper": getattr(whisper, "__version__", None),
+        "device": get_compute_device(),
+    }
+
+def write_benchmark_report(rows, path):
+    """Guarda los resultados del benchmark en JSON o CSV según la extensión"""
+    if path.lower().endswith(".csv"):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else [])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "machine": machine_info(), "results": rows}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+def run_benchmark(args):
+    """Mide carga, decodificación, RTF, memoria y palabras/s por configuración"""
+    audio_files = collect_input_files(args.audio) if args.audio else []
+    if not args.no_synthetic:
+        synthetic_path = os.path.join(get_cache_dir("benchmark"), f"synthetic_{args.duration}s.wav")
+        if not os.path.exists(synthetic_path):
+            write_wav(synthetic_path, synthetic_speech(args.duration))
+        audio_files.insert(0, synthetic_path)
+
+    cases = [
+        {"model": model, "threads": threads, "precision": precision, "audio": audio,
+         "options": {"language": args.language, "speculative": speculative, "draft_model": args.draft_model,
+                     "speculative_tokens": args.speculative_tokens, "encoder_batch": encoder_batch}}
+        for model in args.models
+        for threads in args.threads
+        for precision in args.precisions
+        for encoder_batch in args.encoder_batch
+        for speculative in ((False, True) if args.speculative else (False,))
+        for audio in audio_files
+    ]
+
+    rows = []
+    texts = []
+    context = multiprocessing.get_context("spawn")
+    for index, case in enumerate(cases, start=1):
+        emit_json("start", index=index, total=len(cases), model=case["model"],
+                  threads=case["threads"], precision=case["precision"],
+                  encoder_batch=case["options"]["encoder_batch"],
+                  speculative=case["options"]["speculative"], audio=case["audio"])
+        try:
+            # Un proceso por configuración para que el pico de memoria sea independiente
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                row = pool.submit(_run_benchmark_case, case).result()
+        except Exception as e:
+            emit_json("error", index=index, message=str(e))
+            continue
+        texts.append(row.pop("text"))
+        rows.append(row)
+        emit_json("result", index=index, **row)
+
+    # Velocidad y precisión de cada configuración frente a fp32
+    compare_with_fp32(rows, texts)
+    for row in rows:
+        if row["wer_vs_fp32"] is not None:
+            emit_json("comparison", model=row["model"], threads=row["threads"], audio=row["audio"],
+                      precision=row["precision"], speedup_vs_fp32=row["speedup_vs_fp32"],
+                      wer_vs_fp32=row["wer_vs_fp32"])
+
+    # Decodificación especulativa frente a la voraz: aceleración, tokens aceptados y texto idéntico
+    compare_with_greedy(rows, texts)
+    for row in rows:
+        if row["matches_greedy"] is not None:
+            emit_json("speculative", model=row["model"], threads=row["threads"], audio=row["audio"],
+                      precision=row["precision"], accepted_token_rate=row["accepted_token_rate"],
+                      speedup_vs_greedy=row["speedup_vs_greedy"], matches_greedy=row["matches_greedy"])
+
+    write_benchmark_report(rows, args.output)
+    emit_json("finished", cases=len(cases), output=args.output)
+    return 0 if len(rows) == len(cases) else 1
+
+def run_convert(args):
+    """Convierte modelos al formato plano mapeable en memoria; devuelve el código de salida"""
+    failures = 0
+    for name in args.models:
+        emit_json("start", model=name)
+        started = time.monotonic()
+        try:
+            result = convert_model(name, verify=not args.no_verify)
+        except Exception as e:
+            failures += 1
+            emit_json("error", model=name, message=str(e))
+            continue
+        emit_json("done", elapsed=round(time.monotonic() - started, 2), **result)
+    emit_json("finished", models=len(args.models), failures=failures)
+    return 0 if failures == 0 else 1
+
 def main():
     """Función principal"""
-    root = tk.Tk()
+    if len(sys.argv) > 1:
+        args = build_arg_parser().parse_args()
+        if args.command == "transcribe":
+            sys.exit(run_cli(args))
+        if args.command == "benchmark":
+            sys.exit(run_benchmark(args))
+        if args.command == "convert":
+            sys.exit(run_convert(args))
+
+    if tk is None:
+        print("❌ Tkinter no está disponible; usa el modo 'transcribe' de línea de comandos")
+        sys.exit(1)
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"❌ No se pudo abrir la interfaz gráfica ({e}); usa el modo 'transcribe' de línea de comandos")
+        sys.exit(1)
     app = VoiceExtractor(root)
     root.mainloop()
 
 if __name__ == "__main__":
+    # Necesario para los procesos del modo largo en el ejecutable de PyInstaller
+    multiprocessing.freeze_support()
     main()